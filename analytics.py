@@ -0,0 +1,215 @@
+import os
+import time
+import sqlite3
+import argparse
+from typing import Dict, List, Optional
+
+# --- ANALÍTICA POR RETO Y POR PASO ---
+# Agregados guardados en la misma base SQLite que los reportes y actualizados dentro de la
+# misma transacción que cada alta, baja o recalificación: consultar /api/analytics nunca
+# recorre los reportes. rebuild() los recalcula desde cero con GROUP BY en SQL.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS challenge_stats (
+    challenge_id TEXT PRIMARY KEY,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    graded INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    total_sum REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS daily_stats (
+    challenge_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    submissions INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (challenge_id, day)
+);
+CREATE TABLE IF NOT EXISTS step_stats (
+    challenge_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    graded INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (challenge_id, question_id)
+);
+CREATE TABLE IF NOT EXISTS answer_counts (
+    challenge_id TEXT NOT NULL,
+    question_id TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    n INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (challenge_id, question_id, answer)
+);
+"""
+
+TOP_ANSWERS = 5
+
+
+def _answer_key(answer) -> str:
+    # Igual que trim() de SQLite en rebuild(): sólo se quitan espacios
+    return str(answer if answer is not None else "").strip(" ")
+
+
+def apply_report(conn: sqlite3.Connection, filename: str, report: Dict, sign: int) -> None:
+    # sign=+1 al guardar un reporte, -1 al borrarlo (o antes de reescribirlo)
+    challenge_id = report.get("challenge_id", "")
+    grade = report.get("grade") or None
+    conn.execute(
+        """INSERT INTO challenge_stats (challenge_id, submissions, graded, score_sum, total_sum)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (challenge_id) DO UPDATE SET
+               submissions = submissions + excluded.submissions,
+               graded = graded + excluded.graded,
+               score_sum = score_sum + excluded.score_sum,
+               total_sum = total_sum + excluded.total_sum""",
+        (
+            challenge_id, sign,
+            sign if grade else 0,
+            sign * (grade or {}).get("score", 0),
+            sign * (grade or {}).get("total", 0),
+        ),
+    )
+    conn.execute(
+        """INSERT INTO daily_stats (challenge_id, day, submissions) VALUES (?, ?, ?)
+           ON CONFLICT (challenge_id, day) DO UPDATE SET submissions = submissions + excluded.submissions""",
+        (challenge_id, filename[:8], sign),
+    )
+
+    steps = report.get("steps")
+    if not isinstance(steps, list):
+        steps = []
+    graded_steps = (grade or {}).get("steps") or {}
+    steps = [s for s in steps if isinstance(s, dict) and s.get("question_id") is not None]
+    for step in steps:
+        question_id = step["question_id"]
+        result = graded_steps.get(question_id)
+        conn.execute(
+            """INSERT INTO step_stats (challenge_id, question_id, answers, graded, correct) VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT (challenge_id, question_id) DO UPDATE SET
+                   answers = answers + excluded.answers,
+                   graded = graded + excluded.graded,
+                   correct = correct + excluded.correct""",
+            (challenge_id, question_id, sign, sign if result is not None else 0, sign if result else 0),
+        )
+        conn.execute(
+            """INSERT INTO answer_counts (challenge_id, question_id, answer, n) VALUES (?, ?, ?, ?)
+               ON CONFLICT (challenge_id, question_id, answer) DO UPDATE SET n = n + excluded.n""",
+            (challenge_id, question_id, _answer_key(step.get("answer")), sign),
+        )
+    if sign < 0:
+        _drop_empty(conn, challenge_id, filename[:8], steps)
+
+
+def _drop_empty(conn: sqlite3.Connection, challenge_id: str, day: str, steps: List[Dict]) -> None:
+    # Tras una baja, las filas que llegaron a cero dejan de aparecer en la analítica
+    conn.execute("DELETE FROM challenge_stats WHERE challenge_id = ? AND submissions <= 0", (challenge_id,))
+    conn.execute("DELETE FROM daily_stats WHERE challenge_id = ? AND day = ? AND submissions <= 0", (challenge_id, day))
+    for step in steps:
+        question_id = step.get("question_id")
+        conn.execute(
+            "DELETE FROM step_stats WHERE challenge_id = ? AND question_id = ? AND answers <= 0",
+            (challenge_id, question_id),
+        )
+        conn.execute(
+            "DELETE FROM answer_counts WHERE challenge_id = ? AND question_id = ? AND answer = ? AND n <= 0",
+            (challenge_id, question_id, _answer_key(step.get("answer"))),
+        )
+
+
+def rebuild(conn: sqlite3.Connection) -> None:
+    # Recalculo completo en SQL (json_each + GROUP BY): sin decodificar reportes en Python
+    steps = """
+        SELECT r.challenge_id AS challenge_id,
+               json_extract(s.value, '$.question_id') AS question_id,
+               json_extract(s.value, '$.answer') AS answer,
+               json_extract(r.data, '$.grade.steps.' || json_quote(json_extract(s.value, '$.question_id'))) AS result
+        FROM reports r, json_each(r.data, '$.steps') s
+        WHERE json_type(r.data, '$.steps') = 'array'
+          AND json_extract(s.value, '$.question_id') IS NOT NULL
+    """
+    with conn:
+        conn.execute("DELETE FROM challenge_stats")
+        conn.execute("DELETE FROM daily_stats")
+        conn.execute("DELETE FROM step_stats")
+        conn.execute("DELETE FROM answer_counts")
+        conn.execute(
+            """INSERT INTO challenge_stats (challenge_id, submissions, graded, score_sum, total_sum)
+               SELECT challenge_id, COUNT(*),
+                      SUM(json_extract(data, '$.grade') IS NOT NULL),
+                      COALESCE(SUM(json_extract(data, '$.grade.score')), 0),
+                      COALESCE(SUM(json_extract(data, '$.grade.total')), 0)
+               FROM reports GROUP BY challenge_id"""
+        )
+        conn.execute(
+            """INSERT INTO daily_stats (challenge_id, day, submissions)
+               SELECT challenge_id, substr(filename, 1, 8), COUNT(*) FROM reports GROUP BY 1, 2"""
+        )
+        conn.execute(
+            f"""INSERT INTO step_stats (challenge_id, question_id, answers, graded, correct)
+                SELECT challenge_id, question_id, COUNT(*), SUM(result IS NOT NULL), COALESCE(SUM(result = 1), 0)
+                FROM ({steps}) GROUP BY 1, 2"""
+        )
+        conn.execute(
+            f"""INSERT INTO answer_counts (challenge_id, question_id, answer, n)
+                SELECT challenge_id, question_id, trim(COALESCE(CAST(answer AS TEXT), ''), ' '), COUNT(*)
+                FROM ({steps}) GROUP BY 1, 2, 3"""
+        )
+
+
+def query(conn: sqlite3.Connection, challenge_id: Optional[str] = None) -> List[Dict]:
+    where, params = "", []
+    if challenge_id:
+        where, params = " WHERE challenge_id = ?", [challenge_id]
+
+    result = {}
+    for cid, submissions, graded, score_sum, total_sum in conn.execute(
+        "SELECT challenge_id, submissions, graded, score_sum, total_sum FROM challenge_stats" + where + " ORDER BY challenge_id",
+        params,
+    ):
+        result[cid] = {
+            "challenge_id": cid,
+            "submissions": submissions,
+            "graded": graded,
+            "average_score": round(score_sum / total_sum, 4) if total_sum else None,
+            "per_day": [],
+            "steps": {},
+        }
+    for cid, day, submissions in conn.execute(
+        "SELECT challenge_id, day, submissions FROM daily_stats" + where + " ORDER BY day", params
+    ):
+        if cid in result:
+            result[cid]["per_day"].append({"day": f"{day[:4]}-{day[4:6]}-{day[6:8]}", "submissions": submissions})
+    for cid, qid, answers, graded, correct in conn.execute(
+        "SELECT challenge_id, question_id, answers, graded, correct FROM step_stats" + where + " ORDER BY question_id",
+        params,
+    ):
+        if cid in result:
+            result[cid]["steps"][qid] = {
+                "answers": answers,
+                "accuracy": round(correct / graded, 4) if graded else None,
+                "top_answers": [],
+            }
+    for cid, qid, answer, n in conn.execute(
+        f"""SELECT challenge_id, question_id, answer, n FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY challenge_id, question_id ORDER BY n DESC, answer) AS rk
+                FROM answer_counts{where}
+            ) WHERE rk <= {TOP_ANSWERS}""",
+        params,
+    ):
+        step = result.get(cid, {}).get("steps", {}).get(qid)
+        if step is not None:
+            step["top_answers"].append({"answer": answer, "count": n})
+    return list(result.values())
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Recalcula desde cero los agregados de /api/analytics.")
+    parser.add_argument("--db", default=DB_REPORTS)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    store = ReportStore(args.db)
+    t0 = time.perf_counter()
+    store.rebuild_analytics()
+    print(f"Agregados recalculados para {store.count()} reportes en {time.perf_counter() - t0:.2f} s")
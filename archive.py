@@ -0,0 +1,344 @@
+import os
+import json
+import zlib
+import struct
+import argparse
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from catalog import FileLock
+
+# --- ARCHIVO DE MESES CERRADOS (SEGMENTOS COMPRIMIDOS) ---
+# Los reportes viven en SQLite mientras su mes está "abierto". Un mes cerrado (terminó hace
+# más de ARCHIVE_AFTER_DAYS) se mueve a reportes/archivo/AAAAMM.seg: un solo archivo de
+# sólo lectura con los reportes ordenados del más nuevo al más viejo, comprimidos por
+# bloques, y al final un índice (ID, reto, nombre normalizado, bloque, posición) para
+# filtrar sin descomprimir nada. El mes sale del prefijo AAAAMM del ID.
+#
+# Las consultas descartan meses enteros por rango de fechas y por cursor: las lecturas de
+# datos recientes no abren ningún segmento. Borrar un reporte archivado anota su ID en
+# AAAAMM.seg.del; `python archive.py --compact` reescribe los segmentos sin esos reportes.
+#
+# Formato: MAGIC | bloques zlib (líneas JSON) | índice zlib (JSON) | offset y largo del
+# índice ("<QQ") | MAGIC
+
+MAGIC = b"GE4SEG1\n"
+TRAILER = struct.Struct("<QQ")
+BLOCK_RECORDS = 64
+BLOCK_CACHE = 32
+ARCHIVE_DIR_NAME = "archivo"
+ARCHIVE_AFTER_DAYS = int(os.environ.get("ARCHIVE_AFTER_DAYS", "45"))
+
+# (filename, challenge_id, name_key, data)
+Row = Tuple[str, str, str, str]
+
+
+def month_of(report_id: str) -> Optional[str]:
+    month = report_id[:6]
+    return month if len(month) == 6 and month.isdigit() else None
+
+
+def closed_before(older_than_days: int = ARCHIVE_AFTER_DAYS, today: Optional[datetime] = None) -> str:
+    # Primer mes que sigue abierto: todo mes anterior terminó hace más de older_than_days
+    limit = (today or datetime.now()) - timedelta(days=older_than_days)
+    return limit.strftime("%Y%m")
+
+
+def _fsync_replace(tmp_path: str, path: str) -> None:
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        fd = os.open(os.path.dirname(path) or ".", os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def write_segment(path: str, rows: List[Row]) -> int:
+    rows = sorted(rows, key=lambda r: r[0], reverse=True)
+    blocks, records = [], []
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        for start in range(0, len(rows), BLOCK_RECORDS):
+            chunk = rows[start:start + BLOCK_RECORDS]
+            payload = zlib.compress("\n".join(r[3] for r in chunk).encode("utf-8"), 9)
+            blocks.append([f.tell(), len(payload)])
+            f.write(payload)
+            block = len(blocks) - 1
+            records.extend([r[0], r[1], r[2], block, pos] for pos, r in enumerate(chunk))
+        index = zlib.compress(json.dumps({"blocks": blocks, "records": records}, ensure_ascii=False).encode("utf-8"), 9)
+        index_offset = f.tell()
+        f.write(index)
+        f.write(TRAILER.pack(index_offset, len(index)))
+        f.write(MAGIC)
+        f.flush()
+        os.fsync(f.fileno())
+    _fsync_replace(tmp_path, path)
+    return len(rows)
+
+
+class Segment:
+    def __init__(self, path: str):
+        self.path = path
+        self.signature: Optional[Tuple[int, int]] = None
+        self.blocks: List[List[int]] = []
+        # [filename, challenge_id, name_key, bloque, posición], del más nuevo al más viejo
+        self.records: List[list] = []
+        self.by_id: Dict[str, list] = {}
+        self.deleted: set = set()
+        self._deleted_signature = None
+
+    def load(self, signature: Tuple[int, int]) -> None:
+        with open(self.path, "rb") as f:
+            f.seek(-(TRAILER.size + len(MAGIC)), os.SEEK_END)
+            index_offset, index_length = TRAILER.unpack(f.read(TRAILER.size))
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Segmento incompleto o corrupto: {self.path}")
+            f.seek(index_offset)
+            index = json.loads(zlib.decompress(f.read(index_length)))
+        self.blocks = index["blocks"]
+        self.records = index["records"]
+        self.by_id = {r[0]: r for r in self.records}
+        self.signature = signature
+
+    def load_deleted(self) -> None:
+        path = self.path + ".del"
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self.deleted, self._deleted_signature = set(), None
+            return
+        signature = (st.st_mtime_ns, st.st_size)
+        if signature != self._deleted_signature:
+            with open(path, "r", encoding="utf-8") as f:
+                self.deleted = {line.strip() for line in f if line.strip()}
+            self._deleted_signature = signature
+
+    def live_records(self) -> Iterator[list]:
+        deleted = self.deleted
+        return (r for r in self.records if r[0] not in deleted)
+
+
+class Archive:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._dir_signature = None
+        self._segments: Dict[str, Segment] = {}
+        self._months: List[str] = []
+        self._blocks: "OrderedDict[Tuple[str, int], List[str]]" = OrderedDict()
+        # Bajas, archivado y compactación entre procesos: una baja anotada mientras se
+        # compacta ese mes no debe perderse. Un FileLock nuevo por uso: la instancia guarda
+        # el descriptor abierto y no se puede compartir entre hilos
+        self._write_lock_path = directory + ".lock"
+
+    # --- Lectura ---
+
+    def refresh(self) -> "Archive":
+        # Un stat de la carpeta por consulta; los segmentos se releen sólo si cambiaron
+        try:
+            st = os.stat(self.directory)
+        except FileNotFoundError:
+            self._months, self._segments = [], {}
+            return self
+        signature = st.st_mtime_ns
+        with self._lock:
+            if signature != self._dir_signature:
+                months = sorted(
+                    (name[:6] for name in os.listdir(self.directory)
+                     if name.endswith(".seg") and month_of(name[:6])),
+                    reverse=True,
+                )
+                self._segments = {m: self._segments.get(m) or Segment(self._path(m)) for m in months}
+                self._months = months
+                self._dir_signature = signature
+        return self
+
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, f"{month}.seg")
+
+    def months(self) -> List[str]:
+        return self.refresh()._months
+
+    def segment(self, month: str) -> Optional[Segment]:
+        segment = self._segments.get(month)
+        if segment is None:
+            return None
+        with self._lock:
+            st = os.stat(segment.path)
+            signature = (st.st_mtime_ns, st.st_size)
+            if signature != segment.signature:
+                segment.load(signature)
+                for key in [k for k in self._blocks if k[0] == month]:
+                    del self._blocks[key]
+            segment.load_deleted()
+        return segment
+
+    def _block(self, month: str, segment: Segment, block: int) -> List[str]:
+        key = (month, block)
+        with self._lock:
+            lines = self._blocks.get(key)
+            if lines is not None:
+                self._blocks.move_to_end(key)
+                return lines
+        offset, length = segment.blocks[block]
+        with open(segment.path, "rb") as f:
+            f.seek(offset)
+            lines = zlib.decompress(f.read(length)).decode("utf-8").split("\n")
+        with self._lock:
+            self._blocks[key] = lines
+            while len(self._blocks) > BLOCK_CACHE:
+                self._blocks.popitem(last=False)
+        return lines
+
+    def _data(self, month: str, segment: Segment, record: list) -> str:
+        return self._block(month, segment, record[3])[record[4]]
+
+    def get(self, filename: str) -> Optional[str]:
+        month = month_of(filename)
+        if month is None or month not in self.refresh()._segments:
+            return None
+        segment = self.segment(month)
+        record = segment.by_id.get(filename)
+        if record is None or filename in segment.deleted:
+            return None
+        return self._data(month, segment, record)
+
+    def scan(
+        self,
+        limit: int,
+        below: Optional[str] = None,
+        above: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        challenge_id: Optional[str] = None,
+        name_key: Optional[str] = None,
+    ) -> List[Tuple[str, str]]:
+        # Hasta `limit` pares (filename, data) del más nuevo al más viejo con
+        # above < filename < below y los mismos filtros que ReportStore.page()
+        date_to_bound = date_to + "~" if date_to else None
+        result = []
+        for month in self.months():
+            if below and month > below[:6]:
+                continue
+            if date_to and month > date_to[:6]:
+                continue
+            if (date_from and month < date_from[:6]) or (above and month < above[:6]):
+                break  # Los meses siguientes son todavía más viejos
+            segment = self.segment(month)
+            if segment is None:
+                continue
+            for record in segment.live_records():
+                filename = record[0]
+                if below and filename >= below:
+                    continue
+                if date_to_bound and filename >= date_to_bound:
+                    continue
+                if (date_from and filename < date_from) or (above and filename <= above):
+                    break
+                if challenge_id and record[1] != challenge_id:
+                    continue
+                if name_key and name_key not in record[2]:
+                    continue
+                result.append((filename, self._data(month, segment, record)))
+                if len(result) >= limit:
+                    return result
+        return result
+
+    def name_keys(self) -> List[Tuple[str, str]]:
+        keys = []
+        for month in self.months():
+            keys.extend((r[0], r[2]) for r in self.segment(month).live_records())
+        return keys
+
+    def iter_all(self) -> Iterator[Tuple[str, str]]:
+        for month in self.months():
+            segment = self.segment(month)
+            for record in segment.live_records():
+                yield record[0], self._data(month, segment, record)
+
+    def count(self, challenge_id: Optional[str] = None) -> int:
+        return sum(
+            sum(1 for r in self.segment(m).live_records() if challenge_id is None or r[1] == challenge_id)
+            for m in self.months()
+        )
+
+    def latest_id(self) -> Optional[str]:
+        for month in self.months():
+            for record in self.segment(month).live_records():
+                return record[0]
+        return None
+
+    # --- Escritura (archivado, bajas, compactación) ---
+
+    def delete(self, filename: str) -> None:
+        month = month_of(filename)
+        with FileLock(self._write_lock_path), open(self._path(month) + ".del", "a", encoding="utf-8") as f:
+            f.write(filename + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _existing_rows(self, month: str) -> List[Row]:
+        segment = self.segment(month) if month in self.refresh()._segments else None
+        if segment is None:
+            return []
+        return [(r[0], r[1], r[2], self._data(month, segment, r)) for r in segment.live_records()]
+
+    def store_month(self, month: str, rows: List[Row]) -> int:
+        # Une lo ya archivado de ese mes (sin los borrados) con las filas nuevas
+        os.makedirs(self.directory, exist_ok=True)
+        with FileLock(self._write_lock_path):
+            merged = {r[0]: r for r in self._existing_rows(month)}
+            merged.update((r[0], r) for r in rows)
+            n = write_segment(self._path(month), list(merged.values()))
+            self._clear_deleted(month)
+        return n
+
+    def compact(self, month: str) -> int:
+        # Reescribe el segmento sin los reportes borrados
+        with FileLock(self._write_lock_path):
+            rows = self._existing_rows(month)
+            if rows:
+                write_segment(self._path(month), rows)
+            else:
+                os.remove(self._path(month))
+            self._clear_deleted(month)
+        return len(rows)
+
+    def _clear_deleted(self, month: str) -> None:
+        try:
+            os.remove(self._path(month) + ".del")
+        except FileNotFoundError:
+            pass
+        self.refresh()
+        segment = self._segments.get(month)
+        if segment is not None:
+            segment.load_deleted()
+
+    def has_deleted(self, month: str) -> bool:
+        return os.path.exists(self._path(month) + ".del")
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Archiva los meses cerrados en segmentos comprimidos.")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                        help="Archiva los meses que terminaron hace más de estos días")
+    parser.add_argument("--compact", action="store_true", help="Sólo reescribe los segmentos con reportes borrados")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    store = ReportStore(args.db)
+    if args.compact:
+        for month, n in store.compact_archive():
+            print(f"{month}: {n} reportes tras compactar")
+    else:
+        for month, n in store.archive_months(closed_before(args.older_than_days)):
+            print(f"{month}: {n} reportes archivados en {store.archive._path(month)}")
+    print(f"En SQLite: {store.count() - store.archive.count()}  Archivados: {store.archive.count()}")
@@ -0,0 +1,324 @@
+import os
+import re
+import glob
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+import threading
+import subprocess
+import urllib.request
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from starlette.staticfiles import StaticFiles
+
+# --- PAQUETE DE ESTILOS PROPIO (SIN CDN) ---
+# `python assets.py` recorre el HTML de main.py y de retos/*/index.html y genera en
+# static/bundle/:
+#   - app.<hash>.css: Tailwind compilado sólo con las clases usadas y minificado
+#   - icons.<hash>.css + fuentes: Font Awesome reducido a los iconos usados
+#   - manifest.json con los nombres actuales
+# Los nombres llevan hash del contenido, así que se sirven con caché inmutable.
+# Mientras no exista el manifiesto las páginas siguen usando los CDN.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(BASE_DIR, "static", "bundle")
+BUNDLE_URL = "/static/bundle"
+MANIFEST = os.path.join(BUNDLE_DIR, "manifest.json")
+BUILD_CACHE = os.path.join(BASE_DIR, ".build_cache")
+
+FONTAWESOME_VERSION = "6.0.0"
+FONTAWESOME_CDN = f"https://cdnjs.cloudflare.com/ajax/libs/font-awesome/{FONTAWESOME_VERSION}"
+FONTAWESOME_FONTS = ["fa-solid-900.woff2", "fa-regular-400.woff2", "fa-brands-400.woff2"]
+
+TAILWIND_INPUT = "@tailwind base;\n@tailwind components;\n@tailwind utilities;\n"
+
+# Etiquetas a reemplazar: los CDN o un paquete anterior (otro hash)
+TAILWIND_TAG = re.compile(
+    r'<script[^>]*src="https://cdn\.tailwindcss\.com[^"]*"[^>]*>\s*</script>'
+    r'|<link[^>]*href="/static/bundle/app\.[0-9a-f]+\.css"[^>]*>'
+)
+ICONS_TAG = re.compile(
+    r'<link[^>]*href="[^"]*font-awesome[^"]*"[^>]*>'
+    r'|<link[^>]*href="/static/bundle/icons\.[0-9a-f]+\.css"[^>]*>'
+)
+ICON_NAME = re.compile(r"\bfa-[a-z0-9-]+")
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+# --- Uso en tiempo de ejecución ---
+
+class ImmutableStaticFiles(StaticFiles):
+    # Para static/bundle/: los nombres con hash nunca cambian de contenido
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = IMMUTABLE
+        return response
+
+
+def rewrite_html(html: str, manifest: Optional[Dict[str, str]]) -> str:
+    if not manifest:
+        return html
+    css_tag = f'<link href="{BUNDLE_URL}/{manifest["css"]}" rel="stylesheet">'
+    icons_tag = f'<link href="{BUNDLE_URL}/{manifest["icons"]}" rel="stylesheet">'
+    html = TAILWIND_TAG.sub(lambda m: css_tag, html)
+    return ICONS_TAG.sub(lambda m: icons_tag, html)
+
+
+class AssetBundle:
+    # Relee manifest.json cuando cambia (p. ej. tras reconstruir el paquete)
+    def __init__(self, manifest_path: str = MANIFEST):
+        self.manifest_path = manifest_path
+        self._lock = threading.Lock()
+        self._signature = None
+        self.manifest: Optional[Dict[str, str]] = None
+        self._rendered: Dict[str, str] = {}
+
+    def refresh(self) -> "AssetBundle":
+        try:
+            st = os.stat(self.manifest_path)
+            signature = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            signature = None
+        if signature == self._signature:
+            return self
+        with self._lock:
+            manifest = None
+            if signature is not None:
+                try:
+                    with open(self.manifest_path, "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, json.JSONDecodeError):
+                    manifest = None
+            self.manifest = manifest
+            self._rendered = {}
+            self._signature = signature
+        return self
+
+    def rewrite(self, html: str) -> str:
+        return rewrite_html(html, self.manifest)
+
+    def page(self, name: str, html: str) -> str:
+        # Páginas fijas de main.py: se reescriben una vez por versión del manifiesto
+        rendered = self._rendered.get(name)
+        if rendered is None:
+            rendered = self._rendered[name] = self.rewrite(html)
+        return rendered
+
+
+# --- Construcción ---
+
+def _hashed_name(stem: str, ext: str, data: bytes) -> str:
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def _split_css(css: str) -> List[str]:
+    # Bloques de primer nivel respetando llaves anidadas (@keyframes, @media)
+    blocks, depth, start = [], 0, 0
+    for i, ch in enumerate(css):
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                blocks.append(css[start:i + 1].strip())
+                start = i + 1
+    return [b for b in blocks if b]
+
+
+def subset_icons_css(css: str, used: Set[str]) -> str:
+    # Quita las reglas ".fa-xxx:before{content:...}" de los iconos que nadie usa
+    icon_selector = re.compile(r"^\.(fa-[a-z0-9-]+):{1,2}before$")
+    kept = []
+    for block in _split_css(css):
+        selectors, _, body = block.partition("{")
+        if "content:" in body and not selectors.startswith("@"):
+            parts = [s.strip() for s in selectors.split(",")]
+            icons = [icon_selector.match(p) for p in parts]
+            if all(icons):
+                parts = [p for p, m in zip(parts, icons) if m.group(1) in used]
+                if not parts:
+                    continue
+                block = ",".join(parts) + "{" + body
+        kept.append(block)
+    return "".join(kept)
+
+
+def _fetch(url: str, dest: str) -> None:
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    with urllib.request.urlopen(url, timeout=30) as r, open(dest, "wb") as f:
+        shutil.copyfileobj(r, f)
+
+
+def fontawesome_source(fontawesome_dir: Optional[str]) -> str:
+    # Carpeta con css/all.min.css y webfonts/. Se guarda copia en .build_cache para que las
+    # reconstrucciones automáticas (tras publicar un reto) no necesiten red ni la ruta original.
+    cache = os.path.join(BUILD_CACHE, f"fontawesome-{FONTAWESOME_VERSION}")
+    if fontawesome_dir:
+        if os.path.abspath(fontawesome_dir) != os.path.abspath(cache):
+            for sub in ("css", "webfonts"):
+                shutil.copytree(os.path.join(fontawesome_dir, sub), os.path.join(cache, sub), dirs_exist_ok=True)
+        return cache
+    if not os.path.exists(os.path.join(cache, "css", "all.min.css")):
+        _fetch(f"{FONTAWESOME_CDN}/css/all.min.css", os.path.join(cache, "css", "all.min.css"))
+        for font in FONTAWESOME_FONTS:
+            _fetch(f"{FONTAWESOME_CDN}/webfonts/{font}", os.path.join(cache, "webfonts", font))
+    return cache
+
+
+def _subset_font(path: str, codepoints: Set[int]) -> bytes:
+    # Con fontTools instalado se dejan sólo los glifos usados; si no, la fuente completa
+    try:
+        from fontTools import subset
+    except ImportError:
+        with open(path, "rb") as f:
+            return f.read()
+    options = subset.Options()
+    options.flavor = "woff2"
+    font = subset.load_font(path, options)
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=codepoints)
+    subsetter.subset(font)
+    with tempfile.NamedTemporaryFile(suffix=".woff2", delete=False) as tmp:
+        tmp_path = tmp.name
+    try:
+        subset.save_font(font, tmp_path, options)
+        with open(tmp_path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(tmp_path)
+
+
+def build_icons(sources: Iterable[str], fontawesome_dir: Optional[str], out_dir: str) -> Tuple[str, List[str]]:
+    used = set()
+    for text in sources:
+        used.update(ICON_NAME.findall(text))
+
+    fa_dir = fontawesome_source(fontawesome_dir)
+    with open(os.path.join(fa_dir, "css", "all.min.css"), "r", encoding="utf-8") as f:
+        css = subset_icons_css(f.read(), used)
+    codepoints = {int(cp, 16) for cp in re.findall(r'content:"\\([0-9a-f]+)"', css)}
+    fonts = []
+
+    def replace_src(match):
+        font = match.group(1)
+        data = _subset_font(os.path.join(fa_dir, "webfonts", font), codepoints)
+        name = _hashed_name(font[:-len(".woff2")], ".woff2", data)
+        with open(os.path.join(out_dir, name), "wb") as f:
+            f.write(data)
+        fonts.append(name)
+        return f'src:url({name}) format("woff2")'
+
+    # Sólo woff2 (todos los navegadores de las tabletas lo soportan)
+    css = re.sub(r'src:url\(\.\./webfonts/([\w-]+\.woff2)\) format\("woff2"\)(?:,url\([^)]*\) format\("[^"]*"\))*', replace_src, css)
+    data = css.encode("utf-8")
+    name = _hashed_name("icons", ".css", data)
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(data)
+    return name, fonts
+
+
+def tailwind_command() -> List[str]:
+    # TAILWIND_CLI permite apuntar al binario standalone; si no, el del PATH o npx
+    cli = os.environ.get("TAILWIND_CLI") or shutil.which("tailwindcss")
+    if cli:
+        return [cli]
+    if shutil.which("npx"):
+        return ["npx", "--yes", "tailwindcss@3"]
+    raise SystemExit("No se encontró Tailwind: instala el binario standalone y define TAILWIND_CLI")
+
+
+def build_css(content_files: List[str], out_dir: str) -> str:
+    with tempfile.TemporaryDirectory() as tmp:
+        input_css = os.path.join(tmp, "input.css")
+        output_css = os.path.join(tmp, "app.css")
+        with open(input_css, "w", encoding="utf-8") as f:
+            f.write(TAILWIND_INPUT)
+        subprocess.run(
+            tailwind_command() + ["-i", input_css, "-o", output_css, "--minify", "--content", ",".join(content_files)],
+            check=True,
+        )
+        with open(output_css, "rb") as f:
+            data = f.read()
+    name = _hashed_name("app", ".css", data)
+    with open(os.path.join(out_dir, name), "wb") as f:
+        f.write(data)
+    return name
+
+
+def _prune(out_dir: str, keep: Set[str], max_age: float = 24 * 3600) -> None:
+    # Se conservan un día los archivos de paquetes anteriores para páginas ya abiertas
+    now = time.time()
+    for name in os.listdir(out_dir):
+        path = os.path.join(out_dir, name)
+        if name not in keep and name != "manifest.json" and now - os.path.getmtime(path) > max_age:
+            os.remove(path)
+
+
+def rewrite_challenges(retos_dir: str, manifest: Dict[str, str]) -> int:
+    # Las páginas de retos ya publicadas pasan a apuntar al paquete nuevo
+    from challenge_pages import write_page
+
+    changed = 0
+    for path in glob.glob(os.path.join(retos_dir, "*", "index.html")):
+        with open(path, "r", encoding="utf-8") as f:
+            html = f.read()
+        new_html = rewrite_html(html, manifest)
+        if new_html != html:
+            write_page(path, new_html.encode("utf-8"))
+            changed += 1
+    return changed
+
+
+def build(retos_dir: str = "retos", fontawesome_dir: Optional[str] = None, out_dir: str = BUNDLE_DIR) -> Dict[str, str]:
+    content_files = [os.path.join(BASE_DIR, "main.py")] + sorted(glob.glob(os.path.join(retos_dir, "*", "index.html")))
+    sources = []
+    for path in content_files:
+        with open(path, "r", encoding="utf-8") as f:
+            sources.append(f.read())
+
+    os.makedirs(out_dir, exist_ok=True)
+    icons, fonts = build_icons(sources, fontawesome_dir, out_dir)
+    manifest = {"css": build_css(content_files, out_dir), "icons": icons}
+    # El manifiesto se escribe al final y de forma atómica: es lo que activa el paquete nuevo
+    tmp_manifest = os.path.join(out_dir, "manifest.json.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_manifest, os.path.join(out_dir, "manifest.json"))
+    keep = set(manifest.values()) | set(fonts)
+    _prune(out_dir, keep)
+    rewrite_challenges(retos_dir, manifest)
+    return manifest
+
+
+_build_lock = threading.Lock()
+
+
+def can_build() -> bool:
+    # Sólo se reconstruye desde el servidor con el binario local (npx sería demasiado lento)
+    return bool(os.environ.get("TAILWIND_CLI") or shutil.which("tailwindcss"))
+
+
+def rebuild_if_possible(retos_dir: str = "retos") -> Optional[Dict[str, str]]:
+    # Tras publicar un reto: su HTML puede usar clases que el paquete actual no incluye.
+    # Sólo si ya hay un paquete (no se activa por sorpresa) y con una construcción a la vez.
+    if not can_build() or not os.path.exists(MANIFEST):
+        return None
+    with _build_lock:
+        try:
+            return build(retos_dir)
+        except Exception as e:
+            print(f"Error reconstruyendo static/bundle: {e}")
+            return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera static/bundle (Tailwind purgado + Font Awesome reducido).")
+    parser.add_argument("--retos", default="retos", help="Carpeta con los retos publicados")
+    parser.add_argument("--fontawesome-dir", help="Copia local de Font Awesome (css/ y webfonts/)")
+    args = parser.parse_args()
+
+    result = build(args.retos, args.fontawesome_dir)
+    print(f"Paquete generado en {BUNDLE_DIR}: {result}")
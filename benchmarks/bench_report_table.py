@@ -0,0 +1,104 @@
+# Memoria y latencia de la tabla compacta de reportes (report_table.py) frente a tener el
+# corpus como lista de dicts, y frente a consultar SQLite directamente.
+#
+#   python benchmarks/bench_report_table.py --reports 10000,100000
+#
+# Memoria medida con tracemalloc (bytes asignados al construir cada estructura).
+# Consultas (ms, mediana de --repeat): primera página del listado admin, listado filtrado
+# por reto y por estudiante, e historial (get_many de los reportes de una estudiante).
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_serialization import corpus
+
+
+def measure(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, used
+
+
+def timed(repeat, fn):
+    values = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        values.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(values)
+
+
+def run(n, repeat):
+    from report_store import ReportStore
+    from report_table import ReportTable
+
+    reports = corpus(n)
+    rows = []
+    for i, report in enumerate(reports):
+        report = dict(report)
+        del report["filename"]
+        rows.append((f"2026{1 + i * 12 // n:02d}01_{i:06d}_alumna_{report['challenge_id']}.json", report))
+    raw = [json.dumps(r, ensure_ascii=False) for _, r in rows]
+
+    directory = tempfile.mkdtemp(prefix="bench_")
+    store = ReportStore(os.path.join(directory, "reportes.db"))
+    store.add_many(rows)
+
+    dicts, dict_bytes = measure(lambda: [json.loads(r) for r in raw])
+    del dicts
+    table, table_bytes = measure(lambda: _loaded(ReportTable(), store))
+
+    rng = random.Random(1)
+    student = reports[0]["student_name"]
+    history = [fn for (fn, r) in rows if r["student_name"] == student]
+    queries = {
+        "pagina_admin": lambda src: src.page(50),
+        "por_reto": lambda src: src.page(50, challenge_id=f"reto_{rng.randrange(50):03d}"),
+        "por_estudiante": lambda src: src.page(50, student=student),
+        "historial": lambda src: src.get_many(history),
+    }
+    result = {
+        "reports": n,
+        "bytes_dicts": dict_bytes,
+        "bytes_tabla": table_bytes,
+        "bytes_tabla_estimado": table.memory_bytes(),
+        "sqlite_ms": {k: timed(repeat, lambda: q(store)) for k, q in queries.items()},
+        "tabla_ms": {k: timed(repeat, lambda: q(table)) for k, q in queries.items()},
+    }
+    store.close()
+    return result
+
+
+def _loaded(table, store):
+    table.load(store)
+    return table
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", default="10000")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    for n in [int(x) for x in args.reports.split(",")]:
+        r = run(n, args.repeat)
+        per10k = 10000 / n
+        print(f"reportes={n}")
+        print(f"  memoria  lista de dicts={r['bytes_dicts'] / 2**20:7.1f} MiB  "
+              f"tabla={r['bytes_tabla'] / 2**20:7.1f} MiB  "
+              f"(por 10k reportes: {r['bytes_dicts'] * per10k / 2**20:.1f} -> {r['bytes_tabla'] * per10k / 2**20:.1f} MiB; "
+              f"estimación de la tabla {r['bytes_tabla_estimado'] * per10k / 2**20:.1f} MiB)")
+        for k in r["sqlite_ms"]:
+            print(f"  {k:15s} sqlite={r['sqlite_ms'][k]:8.2f} ms  tabla={r['tabla_ms'][k]:8.2f} ms")
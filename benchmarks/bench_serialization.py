@@ -0,0 +1,119 @@
+# Serialización JSON: camino anterior (json de la biblioteca estándar + jsonable_encoder +
+# validación desde dict) frente a serializer.py (orjson si está instalado) sobre corpus
+# sintéticos de reportes.
+#
+#   python benchmarks/bench_serialization.py --reports 1000,10000,100000
+#   python benchmarks/bench_serialization.py --reports 10000 --out serializacion.json
+#
+# Fases (tiempo total en ms, el mejor de --repeat):
+#   guardar      dict -> texto de la columna data (cada reporte)
+#   leer         texto de la columna data -> dict (cada reporte)
+#   respuesta    cuerpo de /api/all_reports, en páginas de MAX_PAGE_SIZE reportes
+#   validar      cuerpo de /api/submit -> MissionSubmission
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEED = 42
+PHASES = ("guardar", "leer", "respuesta", "validar")
+
+
+def corpus(n: int):
+    rng = random.Random(SEED)
+    reports = []
+    for i in range(n):
+        reports.append({
+            "challenge_id": f"reto_{rng.randrange(50):03d}",
+            "student_name": f"{rng.choice(['María', 'José', 'Sofía', 'Ángel', 'Lucía'])} Pérez {i % 700}",
+            "steps": [
+                {"question_id": f"Paso {s}", "answer": str(rng.randint(1, 999)),
+                 "reasoning": "Multiplico la potencia por las horas de uso y resto las pérdidas " * 2}
+                for s in range(1, 6)
+            ],
+            "timestamp": "2026-01-01 08:00:00",
+            "grade": {"score": rng.randint(0, 5), "total": 5,
+                      "steps": {f"Paso {s}": rng.random() < 0.7 for s in range(1, 6)}},
+            "filename": f"20260101_080000_{i:06d}_Alumna_reto.json",
+        })
+    return reports
+
+
+def best_of(repeat: int, fn) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def run(n: int, repeat: int, main, serializer):
+    from fastapi.encoders import jsonable_encoder
+
+    reports = corpus(n)
+    pages = [reports[i:i + main.MAX_PAGE_SIZE] for i in range(0, n, main.MAX_PAGE_SIZE)]
+    old_rows = [json.dumps(r, ensure_ascii=False) for r in reports]
+    new_rows = [serializer.dumps_str(r) for r in reports]
+    bodies = [json.dumps({k: r[k] for k in ("challenge_id", "student_name", "steps")}).encode("utf-8") for r in reports]
+    Model = main.MissionSubmission
+
+    def old_response():
+        for page in pages:
+            # Lo que hace FastAPI con un dict devuelto por el endpoint y JSONResponse
+            json.dumps(jsonable_encoder({"items": page, "next_cursor": None}),
+                       ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def new_response():
+        for page in pages:
+            main.FastJSONResponse({"items": page, "next_cursor": None})
+
+    old = {
+        "guardar": best_of(repeat, lambda: [json.dumps(r, ensure_ascii=False) for r in reports]),
+        "leer": best_of(repeat, lambda: [json.loads(row) for row in old_rows]),
+        "respuesta": best_of(repeat, old_response),
+        "validar": best_of(repeat, lambda: [Model.model_validate(json.loads(b)) for b in bodies]),
+    }
+    new = {
+        "guardar": best_of(repeat, lambda: [serializer.dumps_str(r) for r in reports]),
+        "leer": best_of(repeat, lambda: [serializer.loads(row) for row in new_rows]),
+        "respuesta": best_of(repeat, new_response),
+        "validar": best_of(repeat, lambda: [Model.model_validate_json(b) for b in bodies]),
+    }
+    size = {"antes": sum(len(r.encode("utf-8")) for r in old_rows), "ahora": sum(len(r.encode("utf-8")) for r in new_rows)}
+    return {"reports": n, "anterior_ms": old, "serializer_ms": new, "bytes_almacenados": size}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", default="1000,10000")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", help="Guarda los resultados en este JSON")
+    args = parser.parse_args()
+
+    # main.py crea carpetas y bases en el directorio actual: se importa en uno temporal
+    out = os.path.abspath(args.out) if args.out else None
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+    import main
+    import serializer
+
+    results = []
+    print(f"backend={serializer.BACKEND}  python={platform.python_version()}")
+    for n in [int(x) for x in args.reports.split(",")]:
+        result = run(n, args.repeat, main, serializer)
+        results.append(result)
+        print(f"reportes={n}  bytes almacenados: {result['bytes_almacenados']['antes']} -> {result['bytes_almacenados']['ahora']}")
+        for phase in PHASES:
+            old, new = result["anterior_ms"][phase], result["serializer_ms"][phase]
+            print(f"  {phase:10s} anterior={old:9.1f} ms  serializer={new:9.1f} ms  x{old / new:5.1f}")
+    if out:
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump({"backend": serializer.BACKEND, "python": platform.python_version(), "results": results},
+                      f, indent=2, ensure_ascii=False)
@@ -0,0 +1,124 @@
+# Latencia de /api/submit mientras el panel admin recorre todo /api/all_reports.
+#
+#   python benchmarks/bench_submit_latency.py --reports 10000 --submits 300
+#   STORAGE_THREADS=2 python benchmarks/bench_submit_latency.py
+#
+# Corre la app en proceso (httpx + ASGITransport) dentro de una carpeta temporal,
+# así no toca los datos reales.
+import os
+import sys
+import time
+import asyncio
+import itertools
+import argparse
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[k]
+
+
+def seed(main, n):
+    reports = []
+    for i in range(n):
+        report = {
+            "challenge_id": f"reto_{i % 20}",
+            "student_name": f"Estudiante {i % 500}",
+            "steps": [
+                {"question_id": f"Paso {s}", "answer": str(i * s), "reasoning": "Multiplico la potencia por las horas " * 3}
+                for s in range(1, 6)
+            ],
+            "timestamp": "2026-01-01 08:00:00",
+        }
+        reports.append((f"20260101_{i:06d}_Estudiante_{i % 500}_reto_{i % 20}.json", report))
+    main.report_store.add_many(reports)
+    main.name_index.rebuild(main.report_store.name_keys())
+    # Con REPORT_TABLE activo el listado y el historial leen de la tabla en memoria
+    if main.report_table is not None:
+        main.report_table.load(main.report_store)
+
+
+async def scan_all(client):
+    cursor = None
+    while True:
+        params = {"pwd": "admin", "limit": 200}
+        if cursor:
+            params["cursor"] = cursor
+        data = (await client.get("/api/all_reports", params=params)).json()
+        cursor = data["next_cursor"]
+        if not cursor:
+            return
+
+
+async def submit_burst(client, n, concurrency):
+    latencies = []
+    sem = asyncio.Semaphore(concurrency)
+    payload = {
+        "challenge_id": "reto_bench",
+        "student_name": "Ana Bench",
+        "steps": [{"question_id": "Paso 1", "answer": "200", "reasoning": "4 x 50 watts"}],
+    }
+
+    sent = itertools.count()
+
+    async def one():
+        # Respuesta distinta en cada envío: si no, la deduplicación no escribiría nada
+        body = dict(payload, steps=[dict(payload["steps"][0], answer=str(next(sent)))])
+        async with sem:
+            t0 = time.perf_counter()
+            r = await client.post("/api/submit", json=body)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            r.raise_for_status()
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one() for _ in range(n)])
+    return latencies, n / (time.perf_counter() - t0)
+
+
+async def run(args):
+    import httpx
+    import main
+
+    seed(main, args.reports)
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        idle = await submit_burst(client, args.submits, args.concurrency)
+
+        stop = asyncio.Event()
+        scans = 0
+
+        async def scanner():
+            nonlocal scans
+            while not stop.is_set():
+                await scan_all(client)
+                scans += 1
+
+        scan_task = asyncio.create_task(scanner())
+        loaded = await submit_burst(client, args.submits, args.concurrency)
+        stop.set()
+        await scan_task
+
+    print(f"reportes={args.reports} submits={args.submits} concurrencia={args.concurrency} "
+          f"STORAGE_THREADS={os.environ.get('STORAGE_THREADS', '8')} REPORT_TABLE={int(main.report_table is not None)}")
+    for label, (values, throughput) in (("en reposo", idle), ("con escaneo admin", loaded)):
+        print(f"  {label:18s} p50={statistics.median(values):7.2f} ms  "
+              f"p99={percentile(values, 99):7.2f} ms  max={max(values):7.2f} ms  "
+              f"{throughput:7.1f} envíos/s")
+    print(f"  escaneos completos de /api/all_reports durante la ráfaga: {scans}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reports", type=int, default=5000)
+    parser.add_argument("--submits", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="bench_"))
+    asyncio.run(run(args))
@@ -0,0 +1,369 @@
+# Suite de benchmarks reproducible: corpus sintéticos, escenarios típicos de clase y
+# resultados en JSON para comparar entre commits.
+#
+#   python benchmarks/bench_suite.py                                  # 1k reportes, 10 y 500 retos, en proceso
+#   python benchmarks/bench_suite.py --reports 1000,10000,100000 --target inproc,uvicorn --out base.json
+#   python benchmarks/bench_suite.py --compare base.json nuevo.json   # diferencias por escenario
+#
+# Cada combinación (reportes x retos) se genera una vez con semilla fija y cada objetivo
+# corre sobre una copia, en un proceso aparte (main.py guarda estado a nivel de módulo):
+#   inproc   la app en proceso con httpx + ASGITransport (sin red)
+#   uvicorn  `python -m uvicorn main:app --workers W` local, medido por HTTP real
+#            (--workers 1,2,4 repite el objetivo con cada cantidad de workers)
+#
+# Escenarios (en este orden; el único que escribe va al final):
+#   challenge_page   GET /reto/{id} con Accept-Encoding: br, gzip
+#   history_search   GET /api/student_history?name=<prefijo de un nombre>
+#   admin_listing    GET /api/all_reports (sin filtro, por reto, por estudiante)
+#   submit_burst     POST /api/submit
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+import statistics
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_submit_latency import percentile
+
+SEED = 42
+SCENARIOS = ("challenge_page", "history_search", "admin_listing", "submit_burst")
+FIRST_NAMES = ["María", "José", "Ana", "Luis", "Sofía", "Andrés", "Lucía", "Mateo", "Valentina", "Julián",
+               "Camila", "Tomás", "Isabel", "Martín", "Daniela", "Sebastián", "Paula", "Nicolás", "Elena", "Ángel"]
+LAST_NAMES = ["Gómez", "Rodríguez", "Pérez", "Martínez", "García", "López", "Hernández", "Díaz", "Muñoz", "Rojas",
+              "Castro", "Ortiz", "Vargas", "Moreno", "Jiménez", "Suárez", "Romero", "Álvarez", "Torres", "Ramírez"]
+
+
+# --- Corpus sintético ---
+
+def student_names(n_reports: int):
+    rng = random.Random(SEED)
+    count = max(20, n_reports // 20)
+    return [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(count)]
+
+
+def challenge_html(rng: random.Random, challenge_id: str) -> str:
+    # Tamaño parecido al de un reto generado por la Gema (~30 KB)
+    paragraphs = "".join(
+        f"<p class='text-gray-700 mb-2'>Paso {i}: calcula la energía de {rng.randint(1, 99)} paneles "
+        f"de {rng.randint(50, 400)} W durante {rng.randint(1, 12)} horas.</p>" * 4
+        for i in range(1, 40)
+    )
+    return (
+        "<!DOCTYPE html><html><head><script src=\"https://cdn.tailwindcss.com\"></script></head>"
+        f"<body class='bg-gray-100 p-8'><h1 class='text-3xl font-bold'>{challenge_id}</h1>{paragraphs}</body></html>"
+    )
+
+
+def build_corpus(path: str, n_reports: int, n_challenges: int) -> None:
+    from report_store import ReportStore
+    from challenge_pages import write_page
+
+    rng = random.Random(SEED)
+    os.makedirs(os.path.join(path, "reportes"))
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        challenges = []
+        for c in range(n_challenges):
+            challenge_id = f"reto_{c:03d}"
+            html_path = f"retos/{challenge_id}/index.html"
+            write_page(html_path, challenge_html(rng, challenge_id).encode("utf-8"))
+            answer_key = {f"Paso {s}": {"answer": str(s * 50), "tolerance": 0.0} for s in range(1, 6)} if c % 2 == 0 else None
+            challenges.append({"id": challenge_id, "title": f"Reto {c}", "desc": "Sintético", "path": html_path,
+                               "date": "2026-01-01", "answer_key": answer_key})
+        with open("challenges.json", "w", encoding="utf-8") as f:
+            json.dump(challenges, f, ensure_ascii=False)
+
+        names = student_names(n_reports)
+        store = ReportStore(os.path.join("reportes", "reportes.db"))
+        start = datetime(2026, 1, 1, 7, 0, 0)
+        step = timedelta(days=60) / max(1, n_reports)
+        batch = []
+        for i in range(n_reports):
+            moment = start + step * i
+            name = rng.choice(names)
+            challenge_id = f"reto_{rng.randrange(n_challenges):03d}"
+            report = {
+                "challenge_id": challenge_id,
+                "student_name": name,
+                "steps": [
+                    {"question_id": f"Paso {s}", "answer": str(s * 50 if rng.random() < 0.7 else rng.randint(1, 999)),
+                     "reasoning": "Multiplico la potencia por las horas de uso " * 2}
+                    for s in range(1, 6)
+                ],
+                "timestamp": moment.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            safe_name = name.replace(" ", "_")
+            batch.append((f"{moment.strftime('%Y%m%d_%H%M%S')}_{i % 1000000:06d}_{safe_name}_{challenge_id}.json", report))
+            if len(batch) == 5000:
+                store.add_many(batch)
+                batch = []
+        if batch:
+            store.add_many(batch)
+        store.close()
+    finally:
+        os.chdir(cwd)
+
+
+# --- Escenarios ---
+
+def make_requests(scenario: str, rng: random.Random, n_reports: int, n_challenges: int):
+    names = student_names(n_reports)
+    if scenario == "challenge_page":
+        return lambda: ("GET", f"/reto/reto_{rng.randrange(n_challenges):03d}",
+                        {"headers": {"Accept-Encoding": "br, gzip"}})
+    if scenario == "history_search":
+        def history():
+            name = rng.choice(names)
+            return "GET", "/api/student_history", {"params": {"name": name[:rng.randint(3, 8)]}}
+        return history
+    if scenario == "admin_listing":
+        def listing():
+            params = {"pwd": "admin", "limit": 50}
+            kind = rng.randrange(3)
+            if kind == 1:
+                params["challenge_id"] = f"reto_{rng.randrange(n_challenges):03d}"
+            elif kind == 2:
+                params["student"] = rng.choice(names).split(" ")[0]
+            return "GET", "/api/all_reports", {"params": params}
+        return listing
+    if scenario == "submit_burst":
+        def submit():
+            return "POST", "/api/submit", {"json": {
+                "challenge_id": f"reto_{rng.randrange(n_challenges):03d}",
+                "student_name": rng.choice(names),
+                "steps": [{"question_id": f"Paso {s}", "answer": str(rng.randrange(10**9)), "reasoning": "4 x 50 W"} for s in range(1, 6)],
+            }}
+        return submit
+    raise ValueError(scenario)
+
+
+async def run_scenario(client, scenario: str, args) -> dict:
+    rng = random.Random(f"{SEED}-{scenario}")
+    next_request = make_requests(scenario, rng, args.reports, args.challenges)
+    latencies = []
+    errors = 0
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def one(measure: bool):
+        nonlocal errors
+        method, url, kwargs = next_request()
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, url, **kwargs)
+                ok = r.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = (time.perf_counter() - t0) * 1000
+        if measure:
+            latencies.append(elapsed)
+            errors += not ok
+
+    # Calentamiento (cachés de páginas, catálogo, conexiones SQLite por hilo) sin medir
+    await asyncio.gather(*[one(False) for _ in range(max(1, args.requests // 10))])
+    t0 = time.perf_counter()
+    await asyncio.gather(*[one(True) for _ in range(args.requests)])
+    wall = time.perf_counter() - t0
+
+    return {
+        "scenario": scenario,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "throughput_rps": round(args.requests / wall, 1),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_worker(args) -> list:
+    import httpx
+
+    os.chdir(args.dir)
+    if args.target == "inproc":
+        import main
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            return [await run_scenario(client, s, args) for s in args.scenarios]
+
+    port = free_port()
+    env = dict(os.environ, PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers[0]),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=args.dir, env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60, limits=limits) as client:
+            for _ in range(300):
+                if server.poll() is not None:
+                    raise SystemExit("uvicorn terminó al arrancar")
+                try:
+                    await client.get("/api/challenges")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            return [await run_scenario(client, s, args) for s in args.scenarios]
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+# --- Orquestación y resultados ---
+
+def git_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=ROOT,
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def target_available(target: str) -> bool:
+    if target == "inproc":
+        return True
+    try:
+        import uvicorn  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def run_suite(args) -> dict:
+    results = {
+        "suite": "bench_suite",
+        "format": 1,
+        **git_info(),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "env": {k: os.environ[k] for k in ("STORAGE_THREADS", "SUBMIT_BATCH_SIZE", "SUBMIT_BATCH_DELAY_MS") if k in os.environ},
+        "runs": [],
+    }
+    workdir = tempfile.mkdtemp(prefix="bench_suite_")
+    try:
+        for n_reports in args.reports:
+            for n_challenges in args.challenges:
+                corpus = os.path.join(workdir, f"corpus_{n_reports}_{n_challenges}")
+                t0 = time.perf_counter()
+                build_corpus(corpus, n_reports, n_challenges)
+                print(f"corpus {n_reports} reportes / {n_challenges} retos generado en {time.perf_counter() - t0:.1f} s",
+                      file=sys.stderr)
+                runs_to_do = [(t, w) for t in args.targets for w in (args.workers if t == "uvicorn" else [1])]
+                for target, workers in runs_to_do:
+                    if not target_available(target):
+                        print(f"  {target}: omitido (uvicorn no está instalado)", file=sys.stderr)
+                        continue
+                    # Copia por objetivo: submit_burst escribe en la base
+                    run_dir = corpus + f"_{target}_{workers}"
+                    shutil.copytree(corpus, run_dir)
+                    cmd = [
+                        sys.executable, os.path.abspath(__file__), "--worker", "--dir", run_dir, "--target", target,
+                        "--workers", str(workers),
+                        "--reports", str(n_reports), "--challenges", str(n_challenges),
+                        "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                        "--scenarios", ",".join(args.scenarios), "--out", run_dir + ".json",
+                    ]
+                    code = subprocess.run(cmd).returncode
+                    shutil.rmtree(run_dir, ignore_errors=True)
+                    if code != 0:
+                        raise SystemExit(f"falló el objetivo {target} con {n_reports} reportes")
+                    with open(run_dir + ".json", encoding="utf-8") as f:
+                        runs = json.load(f)
+                    for run in runs:
+                        run = {"target": target, "workers": workers, "reports": n_reports, "challenges": n_challenges, **run}
+                        results["runs"].append(run)
+                        print(f"  {target:8s} x{workers:<2d} {run['scenario']:15s} p50={run['p50_ms']:8.2f} ms  "
+                              f"p95={run['p95_ms']:8.2f} ms  p99={run['p99_ms']:8.2f} ms  "
+                              f"{run['throughput_rps']:8.1f} req/s  errores={run['errors']}", file=sys.stderr)
+                shutil.rmtree(corpus, ignore_errors=True)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(base_path: str, new_path: str) -> None:
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def key(run):
+        return run["target"], run.get("workers", 1), run["reports"], run["challenges"], run["scenario"]
+
+    before = {key(r): r for r in base["runs"]}
+    print(f"base {str(base.get('commit'))[:10]}  ->  nuevo {str(new.get('commit'))[:10]}")
+    for run in new["runs"]:
+        old = before.get(key(run))
+        if old is None:
+            continue
+        label = "{} x{} {}r/{}c {}".format(*key(run))
+        deltas = []
+        for metric in ("p50_ms", "p99_ms", "throughput_rps"):
+            change = (run[metric] - old[metric]) / old[metric] * 100 if old[metric] else 0.0
+            deltas.append(f"{metric}={old[metric]:.2f}->{run[metric]:.2f} ({change:+.1f}%)")
+        print(f"  {label:45s} " + "  ".join(deltas))
+
+
+def int_list(value: str):
+    return [int(v) for v in value.split(",") if v]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de la app con corpus sintéticos; resultados en JSON.")
+    parser.add_argument("--reports", type=int_list, default=[1000], help="Tamaños de corpus, p. ej. 1000,10000,100000")
+    parser.add_argument("--challenges", type=int_list, default=[10, 500], help="Cantidad de retos, p. ej. 10,500")
+    parser.add_argument("--target", dest="targets", type=lambda v: v.split(","), default=["inproc"],
+                        help="inproc, uvicorn o ambos separados por coma")
+    parser.add_argument("--workers", type=int_list, default=[1], help="Workers de uvicorn, p. ej. 1,2,4")
+    parser.add_argument("--scenarios", type=lambda v: v.split(","), default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=500, help="Peticiones medidas por escenario")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NUEVO"))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.worker:
+        # Proceso hijo: un objetivo sobre un corpus; deja la lista de resultados en --out
+        args.target = args.targets[0]
+        args.reports, args.challenges = args.reports[0], args.challenges[0]
+        runs = asyncio.run(run_worker(args))
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(runs, f)
+    else:
+        unknown = [s for s in args.scenarios if s not in SCENARIOS] + [t for t in args.targets if t not in ("inproc", "uvicorn")]
+        if unknown:
+            raise SystemExit(f"Opciones desconocidas: {', '.join(unknown)}")
+        results = run_suite(args)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Resultados en {args.out}", file=sys.stderr)
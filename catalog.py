@@ -0,0 +1,232 @@
+import os
+import json
+import asyncio
+import hashlib
+import time
+import tempfile
+import threading
+from typing import List, Dict, Optional, Tuple
+
+import metrics
+import serializer
+from storage import run_io
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# --- CATÁLOGO DE RETOS EN MEMORIA ---
+# Mantiene challenges.json ya parseado y serializado. Cada lectura cuesta un os.stat:
+# si cambian mtime o tamaño (otro proceso o edición a mano) se vuelve a cargar.
+# Con varios workers se le pasa el contador compartido (shared_state.Generations): cada
+# escritura lo incrementa y las lecturas sólo comparan el número; el stat queda para las
+# ediciones a mano, como mucho una vez cada CATALOG_STAT_INTERVAL segundos.
+#
+# Escrituras: un asyncio.Lock serializa las peticiones del mismo proceso y un candado
+# de archivo (challenges.json.lock) las de otros workers. Cada cambio se anota antes en
+# un diario (challenges.json.journal) y el archivo nuevo se escribe en un temporal que
+# se renombra con os.replace, así nadie lee nunca un JSON a medio escribir.
+
+CATALOG_STAT_INTERVAL = 1.0
+
+
+class FileLock:
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+        return self
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(self._fd, 0, os.SEEK_SET)
+            msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        os.close(self._fd)
+        self._fd = None
+
+
+def atomic_write_json(path: str, data) -> None:
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def apply_op(items: List[Dict], op: Dict) -> bool:
+    # Operaciones idempotentes: repetirlas al recuperar el diario da el mismo resultado
+    if op["op"] == "upsert":
+        challenge = op["challenge"]
+        existing = next((c for c in items if c.get("id") == challenge["id"]), None)
+        if existing:
+            existing.update({k: v for k, v in challenge.items() if k != "path"})
+        else:
+            items.append(dict(challenge))
+        return True
+    if op["op"] == "delete":
+        before = len(items)
+        items[:] = [c for c in items if c.get("id") != op["id"]]
+        return len(items) != before
+    raise ValueError(f"Operación desconocida: {op['op']}")
+
+
+class ChallengeCatalog:
+    def __init__(self, path: str, generations=None):
+        self.path = path
+        self.generations = generations
+        self._generation: Optional[int] = None
+        self._next_stat = 0.0
+        self.lock_path = path + ".lock"
+        self.journal_path = path + ".journal"
+        self._lock = threading.Lock()
+        self._write_lock = asyncio.Lock()
+        self._signature: Optional[Tuple[int, int]] = None
+        self.items: List[Dict] = []
+        self.by_id: Dict[str, Dict] = {}
+        self.body: bytes = b"[]"
+        self.etag: str = ""
+        self._set_items([])
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _set_items(self, items: List[Dict]) -> None:
+        self.items = items
+        self.by_id = {c["id"]: c for c in items if "id" in c}
+        # La clave de respuestas nunca sale en el listado público
+        public = [{k: v for k, v in c.items() if k != "answer_key"} for c in items]
+        self.body = serializer.dumps(public)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:16] + '"'
+
+    def refresh(self) -> "ChallengeCatalog":
+        generation = self.generations.get("catalog") if self.generations is not None else None
+        if generation is not None and generation == self._generation and time.monotonic() < self._next_stat:
+            return self
+        signature = self._stat()
+        if signature == self._signature and generation == self._generation:
+            self._next_stat = time.monotonic() + CATALOG_STAT_INTERVAL
+            return self
+        with self._lock:
+            signature = self._stat()
+            if signature == self._signature and generation == self._generation:
+                return self
+            items = []
+            if signature is not None:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        items = json.load(f)
+                    metrics.record_read(files=1, nbytes=signature[1])
+                except json.JSONDecodeError:
+                    items = []
+            self._set_items(items)
+            self._signature = signature
+            self._generation = generation
+            self._next_stat = time.monotonic() + CATALOG_STAT_INTERVAL
+        return self
+
+    def invalidate(self) -> None:
+        self._signature = None
+        self._next_stat = 0.0
+
+    def get(self, challenge_id: str) -> Optional[Dict]:
+        return self.refresh().by_id.get(challenge_id)
+
+    def snapshot(self) -> List[Dict]:
+        # Copia para que quien la modifique no altere la caché
+        return [dict(c) for c in self.refresh().items]
+
+    def _read_for_write(self) -> List[Dict]:
+        # A diferencia de refresh(), un JSON corrupto aquí es un error: guardar encima
+        # borraría todos los retos.
+        if not os.path.exists(self.path):
+            return []
+        with open(self.path, "r", encoding="utf-8") as f:
+            try:
+                return json.load(f)
+            except json.JSONDecodeError as e:
+                raise RuntimeError(f"{self.path} está corrupto, no se sobrescribe: {e}")
+
+    def _pending_ops(self) -> List[Dict]:
+        if not os.path.exists(self.journal_path):
+            return []
+        ops = []
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    ops.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break  # Última línea truncada por una caída: esa operación nunca se confirmó
+        return ops
+
+    def _append_journal(self, op: Dict) -> None:
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _clear_journal(self) -> None:
+        with open(self.journal_path, "w", encoding="utf-8"):
+            pass
+
+    def _commit(self, items: List[Dict]) -> None:
+        atomic_write_json(self.path, items)
+        self._clear_journal()
+        with self._lock:
+            self._set_items([dict(c) for c in items])
+            self._signature = self._stat()
+            # Se llama con el candado de archivo tomado: nadie más incrementa a la vez
+            if self.generations is not None:
+                self._generation = self.generations.bump("catalog")
+
+    def recover(self) -> int:
+        # Reaplica lo que quedó en el diario si el proceso murió entre anotar y renombrar
+        with FileLock(self.lock_path):
+            ops = self._pending_ops()
+            if ops:
+                items = self._read_for_write()
+                for op in ops:
+                    apply_op(items, op)
+                self._commit(items)
+            return len(ops)
+
+    def _apply_locked(self, op: Dict) -> bool:
+        with FileLock(self.lock_path):
+            items = self._read_for_write()
+            for pending in self._pending_ops():
+                apply_op(items, pending)
+            changed = apply_op(items, op)
+            if changed:
+                self._append_journal(op)
+                self._commit(items)
+            return changed
+
+    async def apply(self, op: Dict) -> bool:
+        async with self._write_lock:
+            return await run_io(self._apply_locked, op)
+
+    async def upsert(self, challenge: Dict) -> None:
+        await self.apply({"op": "upsert", "challenge": challenge})
+
+    async def remove(self, challenge_id: str) -> bool:
+        return await self.apply({"op": "delete", "id": challenge_id})
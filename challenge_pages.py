@@ -0,0 +1,148 @@
+import os
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él sólo se sirve gzip
+    brotli = None
+
+# --- PÁGINAS DE RETOS PRECOMPRIMIDAS ---
+# create_challenge guarda junto a index.html sus variantes .gz y .br y un hash del
+# contenido (index.html.sha256). /reto/{id} negocia Accept-Encoding, responde 304 a
+# If-None-Match y mantiene las páginas más pedidas en una LRU acotada por bytes.
+
+PAGE_CACHE_BYTES = int(os.environ.get("PAGE_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+ENCODING_SUFFIX = {"br": ".br", "gzip": ".gz"}
+ETAG_SUFFIX = {"identity": "", "br": "-br", "gzip": "-gz"}
+
+
+def _compress(html: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(html, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(html, quality=11)
+    return variants
+
+
+def _write_bytes(path: str, data: bytes) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_page(html_path: str, html: bytes) -> str:
+    # Las variantes se escriben antes que index.html: quien vea el index nuevo ya
+    # encuentra sus compresiones al lado
+    digest = hashlib.sha256(html).hexdigest()
+    os.makedirs(os.path.dirname(html_path), exist_ok=True)
+    for encoding, data in _compress(html).items():
+        _write_bytes(html_path + ENCODING_SUFFIX[encoding], data)
+    _write_bytes(html_path + ".sha256", digest.encode("ascii"))
+    _write_bytes(html_path, html)
+    return digest
+
+
+def negotiate(accept_encoding: str, available) -> str:
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return "identity"
+
+
+class CachedPage:
+    __slots__ = ("digest", "variants", "signature", "size")
+
+    def __init__(self, digest: str, variants: Dict[str, bytes], signature: Tuple[int, int]):
+        self.digest = digest
+        self.variants = variants
+        self.signature = signature
+        self.size = sum(len(v) for v in variants.values())
+
+    def etag(self, encoding: str) -> str:
+        return f'"{self.digest[:32]}{ETAG_SUFFIX[encoding]}"'
+
+
+class PageCache:
+    def __init__(self, max_bytes: int = PAGE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._pages: "OrderedDict[str, CachedPage]" = OrderedDict()
+        self._bytes = 0
+
+    def _load(self, html_path: str, signature: Tuple[int, int]) -> CachedPage:
+        with open(html_path, "rb") as f:
+            html = f.read()
+        digest = hashlib.sha256(html).hexdigest()
+        variants = {"identity": html}
+        for encoding, suffix in ENCODING_SUFFIX.items():
+            try:
+                with open(html_path + suffix, "rb") as f:
+                    variants[encoding] = f.read()
+            except FileNotFoundError:
+                pass
+        try:
+            with open(html_path + ".sha256", "r", encoding="ascii") as f:
+                stored_digest = f.read().strip()
+        except FileNotFoundError:
+            stored_digest = None
+        if stored_digest != digest or "gzip" not in variants:
+            # Retos creados antes de la precompresión (o editados a mano): se regeneran
+            compressed = _compress(html)
+            for encoding, data in compressed.items():
+                _write_bytes(html_path + ENCODING_SUFFIX[encoding], data)
+            _write_bytes(html_path + ".sha256", digest.encode("ascii"))
+            variants.update(compressed)
+        page = CachedPage(digest, variants, signature)
+        metrics.record_read(files=len(variants), nbytes=page.size)
+        return page
+
+    def get(self, challenge_id: str, html_path: str) -> Optional[CachedPage]:
+        # Bloqueante (stat + lecturas): se llama desde el pool de almacenamiento
+        try:
+            st = os.stat(html_path)
+        except FileNotFoundError:
+            self.invalidate(challenge_id)
+            return None
+        signature = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            page = self._pages.get(challenge_id)
+            if page is not None and page.signature == signature:
+                self._pages.move_to_end(challenge_id)
+                return page
+
+        page = self._load(html_path, signature)
+        with self._lock:
+            old = self._pages.pop(challenge_id, None)
+            if old is not None:
+                self._bytes -= old.size
+            if page.size <= self.max_bytes:
+                self._pages[challenge_id] = page
+                self._bytes += page.size
+                while self._bytes > self.max_bytes:
+                    _, evicted = self._pages.popitem(last=False)
+                    self._bytes -= evicted.size
+        return page
+
+    def invalidate(self, challenge_id: str) -> None:
+        with self._lock:
+            page = self._pages.pop(challenge_id, None)
+            if page is not None:
+                self._bytes -= page.size
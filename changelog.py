@@ -0,0 +1,171 @@
+import os
+import time
+import sqlite3
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+import serializer
+
+# --- REGISTRO DE CAMBIOS PARA SINCRONIZACIÓN INCREMENTAL ---
+# Cada alta, reescritura o baja de un reporte añade una fila con un número de secuencia
+# creciente (AUTOINCREMENT: nunca se reutiliza), en la misma transacción que el cambio.
+# /api/reports/changes?since=N devuelve lo ocurrido después de N: quien mantiene una copia
+# hace un trabajo proporcional a los cambios, no al total de reportes.
+#
+# Compactación: de cada reporte sólo se conserva su último cambio, y las bajas más viejas
+# que CHANGELOG_RETENTION_DAYS se eliminan. Cada baja eliminada sube el "horizonte". El
+# cursor que recibe el cliente es "<seq>-<horizonte>": si desde entonces el horizonte subió
+# por encima de su seq, se perdió alguna baja y la respuesta trae reset=true (vaciar la
+# copia y volver a empezar sin since). Empezar de cero siempre es válido: el registro
+# compactado contiene el último alta de cada reporte vivo.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS report_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT NOT NULL,
+    op TEXT NOT NULL,
+    changed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_report_changes_filename ON report_changes (filename);
+CREATE TABLE IF NOT EXISTS report_changes_state (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    horizon INTEGER NOT NULL DEFAULT 0
+);
+INSERT OR IGNORE INTO report_changes_state (id, horizon) VALUES (0, 0);
+"""
+
+UPSERT = "upsert"
+# Reescritura de un reporte que ya existía (reemplazo, recalificación). En /api/reports/changes
+# sale como upsert con rewrite=true; el canal en vivo la usa para no mostrarla como envío nuevo
+UPDATE = "update"
+DELETE = "delete"
+
+CHANGELOG_RETENTION_DAYS = float(os.environ.get("CHANGELOG_RETENTION_DAYS", "30"))
+# Cambios que reemplazan a otros (reescrituras y bajas) tras los que se compacta solo
+CHANGELOG_COMPACT_EVERY = int(os.environ.get("CHANGELOG_COMPACT_EVERY", "1000"))
+MAX_CHANGES_PAGE = 1000
+
+
+def append(conn: sqlite3.Connection, filename: str, op: str) -> None:
+    conn.execute(
+        "INSERT INTO report_changes (filename, op, changed_at) VALUES (?, ?, ?)",
+        (filename, op, time.time()),
+    )
+
+
+def seed(conn: sqlite3.Connection) -> None:
+    # Bases anteriores al registro: un alta por cada reporte existente, en orden de ID
+    with conn:
+        conn.execute(
+            "INSERT INTO report_changes (filename, op, changed_at) SELECT filename, ?, ? FROM reports ORDER BY filename",
+            (UPSERT, time.time()),
+        )
+
+
+def horizon(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT horizon FROM report_changes_state WHERE id = 0").fetchone()[0]
+
+
+def compact(conn: sqlite3.Connection, retention_days: float = CHANGELOG_RETENTION_DAYS) -> Tuple[int, int]:
+    # Devuelve (filas eliminadas, nuevo horizonte). Llamar con el candado de escritura tomado.
+    with conn:
+        superseded = conn.execute(
+            """DELETE FROM report_changes WHERE seq NOT IN (
+                   SELECT MAX(seq) FROM report_changes GROUP BY filename
+               )"""
+        ).rowcount
+        cutoff = time.time() - retention_days * 86400
+        last_dropped = conn.execute(
+            "SELECT MAX(seq) FROM report_changes WHERE op = ? AND changed_at < ?", (DELETE, cutoff)
+        ).fetchone()[0]
+        expired = 0
+        if last_dropped is not None:
+            expired = conn.execute(
+                "DELETE FROM report_changes WHERE op = ? AND seq <= ?", (DELETE, last_dropped)
+            ).rowcount
+            conn.execute(
+                "UPDATE report_changes_state SET horizon = MAX(horizon, ?) WHERE id = 0", (last_dropped,)
+            )
+    return superseded + expired, horizon(conn)
+
+
+def encode_cursor(seq: int, floor: int) -> str:
+    return f"{seq}-{floor}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[int, int]:
+    # ValueError si el cursor no es válido (lo convierte en 400 el endpoint)
+    if not cursor:
+        return 0, 0
+    seq, _, floor = cursor.partition("-")
+    return int(seq), int(floor or 0)
+
+
+def _latest(conn: sqlite3.Connection) -> int:
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'report_changes'").fetchone()
+    return row[0] if row else 0
+
+
+def current_cursor(conn: sqlite3.Connection) -> str:
+    conn.execute("BEGIN")
+    try:
+        return encode_cursor(_latest(conn), horizon(conn))
+    finally:
+        conn.execute("COMMIT")
+
+
+def changes(conn: sqlite3.Connection, since: Optional[str], limit: int,
+            archived: Optional[Callable[[str], Optional[str]]] = None) -> Dict:
+    since_seq, since_floor = decode_cursor(since)
+    # Una sola transacción de lectura: horizonte y filas salen de la misma instantánea
+    # aunque una compactación termine en medio
+    conn.execute("BEGIN")
+    try:
+        latest = _latest(conn)
+        floor = horizon(conn)
+        if since and ((floor > since_floor and since_seq < floor) or since_seq > latest):
+            # Se compactaron bajas que el cliente no llegó a ver (o el cursor es de otra base)
+            return {"reset": True, "changes": [], "cursor": None, "has_more": True}
+
+        rows = conn.execute(
+            """SELECT c.seq, c.op, c.filename, r.data
+               FROM report_changes c LEFT JOIN reports r ON r.filename = c.filename
+               WHERE c.seq > ? ORDER BY c.seq LIMIT ?""",
+            (since_seq, limit + 1),
+        ).fetchall()
+    finally:
+        conn.execute("COMMIT")
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    result: List[Dict] = []
+    for seq, op, filename, data in rows:
+        if op != DELETE:
+            if data is None and archived is not None:
+                # Mes archivado: el reporte ya no está en la tabla pero sigue existiendo
+                data = archived(filename)
+            if data is None:
+                # Borrado después: su baja aparece más adelante en el registro
+                continue
+            report = serializer.loads(data)
+            report["filename"] = filename
+            result.append({"seq": seq, "op": UPSERT, "filename": filename, "report": report, "rewrite": op == UPDATE})
+        else:
+            result.append({"seq": seq, "op": op, "filename": filename})
+    cursor = encode_cursor(rows[-1][0] if rows else since_seq, floor)
+    return {"reset": False, "changes": result, "cursor": cursor, "has_more": has_more}
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Compacta el registro de cambios de /api/reports/changes.")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--retention-days", type=float, default=CHANGELOG_RETENTION_DAYS)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    store = ReportStore(args.db)
+    removed, floor = store.compact_changes(args.retention_days)
+    print(f"Eliminadas {removed} entradas del registro. Horizonte actual: {floor}")
@@ -0,0 +1,186 @@
+import os
+import json
+import asyncio
+import hashlib
+import argparse
+import threading
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from name_index import normalize_name
+from storage import run_io
+
+# --- ENVÍOS IDEMPOTENTES ---
+# Doble clic, reintentos tras un timeout y la cola sin conexión de las páginas de reto
+# pueden mandar la misma misión varias veces. Cada envío tiene una clave derivada de su
+# contenido (reto, nombre normalizado y pasos); si ya existe un reporte con esa clave dentro
+# de IDEMPOTENCY_WINDOW_HOURS, se responde con la calificación original sin escribir nada.
+#
+# La clave se guarda en la columna idem_key del almacén. En memoria sólo hay un filtro de
+# Bloom (~1,2 bytes por envío reciente): si dice "no está", que es lo normal, no se consulta
+# SQLite. Los envíos iguales que llegan a la vez al mismo worker esperan al primero.
+
+IDEMPOTENCY_WINDOW_HOURS = float(os.environ.get("IDEMPOTENCY_WINDOW_HOURS", "72"))
+BLOOM_MIN_CAPACITY = 100_000
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+
+
+def submission_key(report: Dict) -> str:
+    steps = [
+        [str(s.get("question_id", "")), str(s.get("answer", "")).strip(), str(s.get("reasoning", "")).strip()]
+        for s in report.get("steps") or []
+        if isinstance(s, dict)
+    ]
+    canonical = json.dumps(
+        [report.get("challenge_id", ""), normalize_name(report.get("student_name", "")), steps],
+        ensure_ascii=False, separators=(",", ":"),
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:32]
+
+
+class BloomFilter:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.size = max(8, capacity * BLOOM_BITS_PER_KEY)
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str):
+        # La clave ya es un hash: sus 128 bits dan las posiciones (doble hashing)
+        h1, h2 = int(key[:16], 16), int(key[16:32], 16) | 1
+        return ((h1 + i * h2) % self.size for i in range(BLOOM_HASHES))
+
+    def add(self, key: str) -> None:
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class SubmissionDedup:
+    def __init__(self, store, window_hours: float = IDEMPOTENCY_WINDOW_HOURS):
+        self.store = store
+        self.window = timedelta(hours=window_hours)
+        self._lock = threading.Lock()
+        self._bloom = BloomFilter(BLOOM_MIN_CAPACITY)
+        self._count = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+
+    def _cutoff(self) -> str:
+        # Prefijo de ID (AAAAMMDD_HHMMSS) del inicio de la ventana
+        return (datetime.now() - self.window).strftime("%Y%m%d_%H%M%S")
+
+    def rebuild(self) -> None:
+        # Sólo las claves dentro de la ventana: el filtro no crece sin límite
+        keys = self.store.idem_keys(self._cutoff())
+        bloom = BloomFilter(max(BLOOM_MIN_CAPACITY, 2 * len(keys)))
+        for key in keys:
+            bloom.add(key)
+        with self._lock:
+            self._bloom, self._count = bloom, len(keys)
+
+    def add(self, key: str) -> None:
+        # Cada envío llega dos veces (al guardarlo y cuando el seguidor del registro lo
+        # repite), y las recalificaciones otra más: sólo cuentan las claves nuevas, si no el
+        # filtro se reconstruiría a la mitad de su capacidad
+        with self._lock:
+            if key in self._bloom:
+                return
+            self._bloom.add(key)
+            self._count += 1
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        # Reporte original dentro de la ventana, o None. Se llama desde el pool de almacenamiento.
+        if self._count > self._bloom.capacity:
+            # Lleno: más falsos positivos. Se reconstruye con las claves recientes.
+            self.rebuild()
+        if key not in self._bloom:
+            return None
+        return self.store.find_by_key(key, self._cutoff())
+
+    async def once(self, key: str, save: Callable[[], Awaitable[Dict]]) -> Tuple[Dict, bool]:
+        # (resultado, es_duplicado). `save` guarda el envío y devuelve {"grade": ...}
+        pending = self.pending(key)
+        if pending is not None:
+            return await asyncio.shield(pending), True
+        self.claim(key)
+        try:
+            original = await run_io(self.lookup, key)
+            if original is not None:
+                result, duplicate = {"grade": original.get("grade")}, True
+            else:
+                result, duplicate = await save(), False
+                self.add(key)
+            self.release(key, result)
+            return result, duplicate
+        except BaseException as e:
+            self.release(key, error=e)
+            raise
+
+    def claim(self, key: str) -> bool:
+        # Marca el envío como en curso (las peticiones con la misma clave esperan su
+        # resultado). False si ya lo estaba. Siempre se llama desde el event loop.
+        if key in self._pending:
+            return False
+        self._pending[key] = asyncio.get_running_loop().create_future()
+        return True
+
+    def release(self, key: str, result: Optional[Dict] = None, error: Optional[BaseException] = None) -> None:
+        fut = self._pending.pop(key, None)
+        if fut is None or fut.done():
+            return
+        if error is not None:
+            fut.set_exception(error)
+            fut.exception()  # Sin esperas pendientes no debe quedar "never retrieved"
+        else:
+            fut.set_result(result)
+
+    def pending(self, key: str) -> Optional[asyncio.Future]:
+        return self._pending.get(key)
+
+
+def collapse_duplicates(store, window_hours: float = IDEMPOTENCY_WINDOW_HOURS, dry_run: bool = False) -> List[str]:
+    # Pasada sin conexión: de cada grupo de reportes con la misma clave se conserva el más
+    # antiguo y se borran los que llegaron dentro de la ventana siguiente. Los que llegaron
+    # después se tratan como un intento nuevo. Borra con store.delete(), así la analítica,
+    # el registro de cambios y los demás workers se enteran.
+    window = timedelta(hours=window_hours)
+    removed = []
+    for filenames in store.duplicate_groups():
+        kept_at = None
+        for filename in filenames:
+            moment = _id_time(filename)
+            if kept_at is not None and moment is not None and moment - kept_at <= window:
+                removed.append(filename)
+                if not dry_run:
+                    store.delete(filename)
+            else:
+                kept_at = moment
+    return removed
+
+
+def _id_time(report_id: str) -> Optional[datetime]:
+    try:
+        return datetime.strptime(report_id[:15], "%Y%m%d_%H%M%S")
+    except ValueError:
+        return None
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Elimina los envíos duplicados del almacén de reportes.")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--window-hours", type=float, default=IDEMPOTENCY_WINDOW_HOURS)
+    parser.add_argument("--dry-run", action="store_true", help="Sólo lista lo que se borraría")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    store = ReportStore(args.db)
+    removed = collapse_duplicates(store, args.window_hours, args.dry_run)
+    for filename in removed:
+        print(filename)
+    verb = "Se borrarían" if args.dry_run else "Borrados"
+    print(f"{verb} {len(removed)} duplicados. Total en el almacén: {store.count()}")
@@ -0,0 +1,106 @@
+import io
+import os
+import csv
+import argparse
+from typing import AsyncIterator, Dict, Iterator, Optional
+
+import serializer
+from storage import run_io
+
+# --- EXPORTACIÓN DE EVIDENCIAS (NDJSON / CSV) ---
+# Una fila por paso (StepEvidence). Los reportes se leen del almacén página a página,
+# así la memoria no crece con el número de reportes.
+
+EXPORT_COLUMNS = ["filename", "challenge_id", "student_name", "timestamp", "question_id", "answer", "reasoning"]
+EXPORT_PAGE_SIZE = 500
+
+
+def report_rows(report: Dict) -> Iterator[Dict]:
+    # Reportes antiguos o importados a mano pueden traer steps con otra forma: se omite lo
+    # que no es un paso, para no cortar la descarga a medias
+    steps = report.get("steps")
+    if not isinstance(steps, list):
+        steps = []
+    for step in steps:
+        if not isinstance(step, dict):
+            continue
+        yield {
+            "filename": report.get("filename"),
+            "challenge_id": report.get("challenge_id"),
+            "student_name": report.get("student_name"),
+            "timestamp": report.get("timestamp"),
+            "question_id": step.get("question_id"),
+            "answer": step.get("answer"),
+            "reasoning": step.get("reasoning"),
+        }
+
+
+def format_ndjson(row: Dict) -> str:
+    return serializer.dumps_str(row) + "\n"
+
+
+def format_csv(row: Dict) -> str:
+    buf = io.StringIO()
+    csv.writer(buf).writerow([row[c] if row[c] is not None else "" for c in EXPORT_COLUMNS])
+    return buf.getvalue()
+
+
+def csv_header() -> str:
+    # BOM para que Excel abra las tildes correctamente
+    return "\ufeff" + ",".join(EXPORT_COLUMNS) + "\r\n"
+
+
+def iter_export(store, fmt: str, **filters) -> Iterator[str]:
+    # Versión síncrona para la línea de comandos
+    fmt_row = format_csv if fmt == "csv" else format_ndjson
+    if fmt == "csv":
+        yield csv_header()
+    cursor: Optional[str] = None
+    while True:
+        reports, cursor = store.page(EXPORT_PAGE_SIZE, cursor, **filters)
+        for report in reports:
+            for row in report_rows(report):
+                yield fmt_row(row)
+        if not cursor:
+            return
+
+
+async def aiter_export(store, fmt: str, **filters) -> AsyncIterator[str]:
+    # Versión para StreamingResponse: cada página se lee en el pool de almacenamiento
+    fmt_row = format_csv if fmt == "csv" else format_ndjson
+    if fmt == "csv":
+        yield csv_header()
+    cursor: Optional[str] = None
+    while True:
+        reports, cursor = await run_io(store.page, EXPORT_PAGE_SIZE, cursor, **filters)
+        yield "".join(fmt_row(row) for report in reports for row in report_rows(report))
+        if not cursor:
+            return
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Exporta las evidencias a NDJSON o CSV (una fila por paso).")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="csv")
+    parser.add_argument("--out", required=True, help="Archivo de salida")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--challenge-id")
+    parser.add_argument("--date-from", help="AAAA-MM-DD")
+    parser.add_argument("--date-to", help="AAAA-MM-DD")
+    parser.add_argument("--student")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    store = ReportStore(args.db)
+    filters = {
+        "challenge_id": args.challenge_id,
+        "date_from": args.date_from,
+        "date_to": args.date_to,
+        "student": args.student,
+    }
+    with open(args.out, "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_export(store, args.format, **filters):
+            f.write(chunk)
+    print(f"Exportado a {args.out}")
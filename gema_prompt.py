@@ -154,6 +154,94 @@ HTML
 
     <script>
 
+        // COLA SIN CONEXIÓN: si el Wi-Fi falla, la misión se guarda en este dispositivo
+
+        // y se envía sola (en lote) cuando vuelve la conexión. NO MODIFICAR ESTE BLOQUE.
+
+        const COLA_ENVIOS = 'misiones_pendientes';
+
+        let enviandoCola = false;
+
+
+
+        function leerCola() {
+
+            try { return JSON.parse(localStorage.getItem(COLA_ENVIOS)) || []; } catch (e) { return []; }
+
+        }
+
+
+
+        function encolarMision(data) {
+
+            const cola = leerCola();
+
+            cola.push(data);
+
+            localStorage.setItem(COLA_ENVIOS, JSON.stringify(cola));
+
+        }
+
+
+
+        async function vaciarCola() {
+
+            if (enviandoCola || !navigator.onLine) return;
+
+            enviandoCola = true;
+
+            try {
+
+                let cola = leerCola();
+
+                while (cola.length) {
+
+                    const lote = cola.slice(0, 50);
+
+                    const response = await fetch('/api/submit_batch', {
+
+                        method: 'POST',
+
+                        headers: { 'Content-Type': 'application/json' },
+
+                        body: JSON.stringify({ submissions: lote })
+
+                    });
+
+                    if (!response.ok) return;
+
+                    // Guardadas (o inválidas para siempre): salen de la cola. Se relee por si
+
+                    // se encoló otra misión mientras tanto.
+
+                    cola = leerCola().slice(lote.length);
+
+                    localStorage.setItem(COLA_ENVIOS, JSON.stringify(cola));
+
+                }
+
+            } catch (error) {
+
+                // Sigue sin conexión: se reintenta más tarde
+
+            } finally {
+
+                enviandoCola = false;
+
+            }
+
+        }
+
+
+
+        window.addEventListener('online', vaciarCola);
+
+        window.addEventListener('load', vaciarCola);
+
+        setInterval(vaciarCola, 30000);
+
+
+
         async function submitMission(e) {
 
             e.preventDefault();
@@ -204,6 +292,18 @@ HTML
 
 
 
+            const guardarSinConexion = () => {
+
+                encolarMision(data);
+
+                alert("Sin conexión con el servidor central: tu misión quedó guardada en este dispositivo y se enviará sola al volver la red. No cierres el navegador.");
+
+                btn.innerHTML = '<i class="fas fa-satellite-dish"></i> Misión en cola de envío';
+
+            };
+
+
+
             try {
 
                 const response = await fetch('/api/submit', {
@@ -224,6 +324,10 @@ HTML
 
                     window.location.href = "/"; 
 
+                } else if (response.status >= 500) {
+
+                    guardarSinConexion();
+
                 } else {
 
                     alert("Error: Desincronización en la matriz de red.");
@@ -236,11 +340,7 @@ HTML
 
             } catch (error) {
 
-                alert("Alerta: Conexión con el servidor central interrumpida.");
-
-                btn.innerHTML = originalText;
-
-                btn.disabled = false;
+                guardarSinConexion();
 
             }
 
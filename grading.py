@@ -0,0 +1,132 @@
+import os
+import argparse
+import threading
+import unicodedata
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# --- CALIFICACIÓN AUTOMÁTICA CON CLAVE DE RESPUESTAS ---
+# Cada reto puede traer "answer_key": {"Paso 1": {"answer": "200", "tolerance": 0.5}, ...}.
+# La clave se compila una vez por reto a una función por paso y se guarda en memoria;
+# sólo se recompila cuando cambia el catálogo (su ETag).
+
+REGRADE_BATCH = 500
+
+
+def _parse_number(value) -> Optional[float]:
+    # Acepta "0,5" además de "0.5": las alumnas escriben con coma decimal
+    try:
+        return float(str(value).strip().replace(",", "."))
+    except (TypeError, ValueError):
+        return None
+
+
+def _normalize_text(value) -> str:
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    return " ".join("".join(c for c in decomposed if not unicodedata.combining(c)).lower().split())
+
+
+def compile_step(expected, tolerance: float = 0.0) -> Callable[[str], bool]:
+    number = _parse_number(expected)
+    if number is not None:
+        tolerance = abs(float(tolerance or 0))
+
+        def check_number(answer: str) -> bool:
+            got = _parse_number(answer)
+            return got is not None and abs(got - number) <= tolerance
+        return check_number
+
+    text = _normalize_text(expected)
+
+    def check_text(answer: str) -> bool:
+        return _normalize_text(answer) == text
+    return check_text
+
+
+def compile_key(answer_key: Dict[str, Dict]) -> Dict[str, Callable[[str], bool]]:
+    return {
+        question_id: compile_step(entry.get("answer"), entry.get("tolerance", 0.0))
+        for question_id, entry in answer_key.items()
+    }
+
+
+def grade_steps(validators: Dict[str, Callable[[str], bool]], steps: Iterable[Dict]) -> Dict:
+    answers = {s.get("question_id"): s.get("answer", "") for s in steps}
+    results = {qid: check(answers.get(qid, "")) for qid, check in validators.items()}
+    return {
+        "score": sum(results.values()),
+        "total": len(results),
+        "steps": results,
+    }
+
+
+class Grader:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._etag: Optional[str] = None
+        self._validators: Dict[str, Dict[str, Callable[[str], bool]]] = {}
+
+    def sync(self, catalog) -> None:
+        # catalog: ChallengeCatalog ya refrescado
+        if catalog.etag == self._etag:
+            return
+        with self._lock:
+            self._validators = {
+                challenge_id: compile_key(c["answer_key"])
+                for challenge_id, c in catalog.by_id.items()
+                if c.get("answer_key")
+            }
+            self._etag = catalog.etag
+
+    def has_key(self, challenge_id: str) -> bool:
+        return challenge_id in self._validators
+
+    def grade(self, challenge_id: str, steps: Iterable[Dict]) -> Optional[Dict]:
+        validators = self._validators.get(challenge_id)
+        if validators is None:
+            return None
+        return grade_steps(validators, steps)
+
+
+def regrade(store, grader: Grader, challenge_id: Optional[str] = None) -> Tuple[int, int]:
+    # Una sola pasada sobre el corpus (o sobre un reto), escribiendo en lotes.
+    # Devuelve (recalificados, omitidos): los meses archivados no se reescriben
+    updated = skipped = 0
+    cursor = None
+    while True:
+        reports, cursor = store.page(REGRADE_BATCH, cursor, challenge_id=challenge_id)
+        batch: List[Tuple[str, Dict]] = []
+        for report in reports:
+            grade = grader.grade(report.get("challenge_id", ""), report.get("steps") or [])
+            if grade != report.get("grade"):
+                filename = report.pop("filename")
+                if grade is None:
+                    report.pop("grade", None)
+                else:
+                    report["grade"] = grade
+                batch.append((filename, report))
+        if batch:
+            written = store.update_many(batch)
+            updated += written
+            skipped += len(batch) - written
+        if not cursor:
+            return updated, skipped
+
+
+if __name__ == "__main__":
+    from catalog import ChallengeCatalog
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Recalifica los reportes guardados con las claves actuales.")
+    parser.add_argument("--challenge-id", help="Sólo este reto (por defecto, todos)")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--challenges", default="challenges.json")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"No existe la base de reportes {args.db}")
+    grader = Grader()
+    grader.sync(ChallengeCatalog(args.challenges).refresh())
+    n, skipped = regrade(ReportStore(args.db), grader, args.challenge_id)
+    print(f"Reportes recalificados: {n}")
+    if skipped:
+        print(f"Sin recalificar por estar archivados: {skipped}")
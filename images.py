@@ -0,0 +1,77 @@
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from PIL import Image
+except ImportError:  # Pillow es opcional: sin él se sirven las fotos originales
+    Image = None
+
+# --- FOTOS DE LA PORTADA: MANIFIESTO EN MEMORIA Y MINIATURAS WEBP ---
+# La lista de static/img* se guarda en memoria y sólo se vuelve a leer cuando cambia el
+# mtime de la carpeta. Las miniaturas WebP (THUMB_WIDTHS) se generan la primera vez que
+# se piden y quedan en static/_miniaturas/ para las siguientes visitas.
+
+VALID_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".gif")
+THUMB_WIDTHS = (320, 640, 1024)
+THUMB_DIR_NAME = "_miniaturas"
+WEBP_QUALITY = 80
+
+
+class ImageManifest:
+    def __init__(self, static_dir: str):
+        self.static_dir = static_dir
+        self.thumb_dir = os.path.join(static_dir, THUMB_DIR_NAME)
+        self._lock = threading.Lock()
+        self._dir_mtime: Optional[int] = None
+        self.images: List[str] = []
+        self.versions: Dict[str, int] = {}
+
+    def refresh(self) -> "ImageManifest":
+        # Un solo stat por petición; listdir sólo si la carpeta cambió
+        mtime = os.stat(self.static_dir).st_mtime_ns
+        if mtime == self._dir_mtime:
+            return self
+        with self._lock:
+            names = sorted(
+                f for f in os.listdir(self.static_dir)
+                if f.lower().endswith(VALID_EXTENSIONS) and f.startswith("img")
+            )
+            self.versions = {n: os.stat(os.path.join(self.static_dir, n)).st_mtime_ns for n in names}
+            self.images = names
+            self._dir_mtime = mtime
+        return self
+
+    def describe(self, name: str) -> Dict:
+        # Datos para <img src srcset>: la URL de cada miniatura lleva la versión del original
+        entry = {"src": f"/static/{name}"}
+        if Image is not None:
+            version = self.versions.get(name, 0)
+            entry["srcset"] = ", ".join(f"/img/{w}/{name}?v={version} {w}w" for w in THUMB_WIDTHS)
+        return entry
+
+    def thumbnail(self, name: str, width: int) -> Optional[Tuple[str, bool]]:
+        # Devuelve (ruta, es_miniatura). Bloqueante: se llama desde el pool de almacenamiento.
+        if name not in self.versions or width not in THUMB_WIDTHS:
+            return None
+        original = os.path.join(self.static_dir, name)
+        if Image is None:
+            return original, False
+
+        # Con la extensión original: img1.jpg e img1.png tienen miniaturas distintas
+        path = os.path.join(self.thumb_dir, f"{name}.{width}.webp")
+        try:
+            if os.stat(path).st_mtime_ns >= os.stat(original).st_mtime_ns:
+                return path, True
+        except FileNotFoundError:
+            pass
+
+        os.makedirs(self.thumb_dir, exist_ok=True)
+        with Image.open(original) as img:
+            img = img.convert("RGBA" if img.mode in ("RGBA", "LA", "P") else "RGB")
+            if img.width > width:
+                img = img.resize((width, round(img.height * width / img.width)), Image.LANCZOS)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            img.save(tmp_path, "WEBP", quality=WEBP_QUALITY, method=4)
+        os.replace(tmp_path, path)
+        return path, True
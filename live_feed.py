@@ -0,0 +1,106 @@
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Set
+
+import serializer
+
+# --- CANAL EN VIVO PARA EL PANEL ADMIN (Server-Sent Events) ---
+# El seguidor del registro de cambios (shared_state.ChangeFollower) publica en un hub en
+# memoria; cada panel abierto es un suscriptor con su cola. El evento se serializa una sola
+# vez y se reparte a todas las colas con put_nowait: publicar nunca espera a un cliente lento.
+#
+# El id de cada evento es el seq del registro de cambios, el mismo en todos los workers. Si
+# el navegador se reconecta (EventSource lo hace solo y envía Last-Event-ID), aunque sea a
+# otro worker, se le reenvían los eventos posteriores desde el historial. Si ese id es
+# anterior a lo que este worker conoce, o su cola se llenó, recibe "resync" y el panel
+# recarga la lista. Si es posterior (este worker va atrasado), los eventos que ya vio se
+# omiten cuando lleguen.
+
+QUEUE_SIZE = 256
+HISTORY_SIZE = 512
+KEEPALIVE_SECONDS = 15.0
+
+
+class LiveHub:
+    def __init__(self, history_size: int = HISTORY_SIZE, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._last_id = 0
+        # Todos los cambios con seq > _known_from están en el historial
+        self._known_from = 0
+        self._history: deque = deque(maxlen=history_size)
+        self._subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def listeners(self) -> int:
+        return len(self._subscribers)
+
+    def start_at(self, seq: int) -> None:
+        # Punto del registro desde el que este worker sigue los cambios (al arrancar o tras
+        # recargar todo): lo anterior ya no se puede reenviar
+        self._history.clear()
+        self._known_from = self._last_id = seq
+
+    def _resync(self) -> bytes:
+        return f"id: {self._last_id}\nevent: resync\ndata: {{}}\n\n".encode("utf-8")
+
+    def publish(self, event: str, data: Dict, seq: int) -> None:
+        # Se llama desde el event loop, con el seq del cambio en el registro
+        self._last_id = max(self._last_id, seq)
+        payload = serializer.dumps_str(data)
+        message = f"id: {seq}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8")
+        if len(self._history) == self._history.maxlen:
+            self._known_from = self._history[0][0]
+        self._history.append((seq, message))
+        self._broadcast((seq, message))
+
+    def resync(self, seq: int) -> None:
+        # Este worker recargó todo: los paneles conectados deben recargar también
+        self.start_at(seq)
+        self._broadcast((None, self._resync()))
+
+    def _broadcast(self, item) -> None:
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(item)
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: se vacía su cola y se le pide recargar
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait((None, self._resync()))
+
+    def _missed(self, last: Optional[int]):
+        if last is None:
+            return []
+        if last < self._known_from:
+            return [self._resync()]
+        return [message for event_id, message in self._history if event_id > last]
+
+    async def stream(self, last_event_id: Optional[str] = None,
+                     keepalive: float = KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        last = None
+        if last_event_id:
+            try:
+                last = int(last_event_id)
+            except ValueError:
+                last = -1
+        missed = self._missed(last)
+        self._subscribers.add(queue)
+        try:
+            # Reintento de EventSource tras un corte: 3 s
+            yield b"retry: 3000\n\n"
+            for message in missed:
+                yield message
+            while True:
+                try:
+                    event_id, message = await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    # Comentario SSE para que proxies y navegadores no cierren la conexión
+                    yield b": ping\n\n"
+                    continue
+                # Reconexión desde un worker más adelantado: ese evento ya lo recibió
+                if event_id is not None and last is not None and event_id <= last:
+                    continue
+                yield message
+        finally:
+            self._subscribers.discard(queue)
@@ -1,27 +1,159 @@
 import os
-import json
-import shutil
+import asyncio
 from datetime import datetime
 from typing import List, Optional, Dict
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Request, BackgroundTasks, Depends
+from fastapi.responses import HTMLResponse, FileResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 import random
+from report_store import ReportStore, DB_REPORTS
+from name_index import NameIndex, clean_name, normalize_name
+from catalog import ChallengeCatalog
+import storage
+from storage import run_io
+from submit_pipeline import SubmitPipeline, ReportIdGenerator
+from export_reports import aiter_export
+from grading import Grader, regrade
+from challenge_pages import PageCache, write_page, negotiate
+from assets import AssetBundle, ImmutableStaticFiles, BUNDLE_DIR, rebuild_if_possible
+from images import ImageManifest
+import metrics
+import profiler
+from live_feed import LiveHub
+import changelog
+from shared_state import Generations, ChangeFollower, startup_lock
+from dedup import SubmissionDedup, submission_key
+from serializer import FastJSONResponse, json_body
+from report_table import ReportTable, REPORT_TABLE_ENABLED
+import search_index
 
-app = FastAPI()
+# Respuestas con orjson si está instalado (serializer.py)
+app = FastAPI(default_response_class=FastJSONResponse)
+# Latencia, tamaños y lecturas de almacenamiento por ruta, expuestos en /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+# Perfilado bajo demanda (PROFILER=header|all); desactivado no se instala nada
+if profiler.PROFILER_MODE:
+    app.add_middleware(profiler.ProfilerMiddleware, admin_pwd="admin")
 
 # --- CONFIGURACIÓN DE DIRECTORIOS ---
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 STATIC_DIR = os.path.join(BASE_DIR, "static")
 
 os.makedirs(STATIC_DIR, exist_ok=True)
+os.makedirs(BUNDLE_DIR, exist_ok=True)
 os.makedirs("retos", exist_ok=True)
 os.makedirs("reportes", exist_ok=True)
 
+# CSS/iconos generados por `python assets.py` (nombres con hash: caché inmutable)
+app.mount("/static/bundle", ImmutableStaticFiles(directory=BUNDLE_DIR), name="bundle")
 app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+asset_bundle = AssetBundle()
+image_manifest = ImageManifest(STATIC_DIR)
 DB_CHALLENGES = "challenges.json"
 
+# Varios workers (uvicorn --workers N) comparten la misma base y challenges.json; cada
+# escritura incrementa un contador compartido para que los demás invaliden sus cachés.
+generations = Generations()
+challenge_catalog = ChallengeCatalog(DB_CHALLENGES, generations)
+
+# Migraciones de arranque (diario del catálogo, esquema SQLite, JSON sueltos de versiones
+# anteriores, compactación del registro de cambios): un solo worker a la vez.
+with startup_lock():
+    challenge_catalog.recover()
+    # Almacén de reportes: reemplaza el escaneo de reportes/*.json en cada consulta.
+    report_store = ReportStore(DB_REPORTS, generations)
+    report_store.import_directory("reportes")
+    # Registro de cambios de /api/reports/changes: sólo el último cambio de cada reporte
+    report_store.compact_changes()
+MAX_PAGE_SIZE = 200
+# Envíos por petición en /api/submit_batch (la cola sin conexión de las páginas de reto)
+MAX_SUBMIT_BATCH = 200
+
+# Índice en memoria de nombres -> reportes para el historial de cada estudiante
+name_index = NameIndex()
+
+# Corpus residente en formato compacto para el listado admin y el historial (REPORT_TABLE=0:
+# se lee de SQLite). Ambos tienen page() y get_many() con la misma firma.
+report_table = ReportTable() if REPORT_TABLE_ENABLED else None
+report_reader = report_table if report_table is not None else report_store
+
+# Los envíos se guardan en lotes (un commit por lote) con IDs monotónicos sin colisiones,
+# también entre workers
+report_ids = ReportIdGenerator(report_store.latest_id(), generations)
+submit_pipeline = SubmitPipeline(report_store)
+# Reenvíos de la misma misión (doble clic, reintentos, cola sin conexión): no se guardan dos veces
+submission_dedup = SubmissionDedup(report_store)
+
+# Páginas de retos más visitadas, ya comprimidas, en memoria
+page_cache = PageCache()
+
+# Altas y bajas de reportes en vivo para los paneles admin abiertos (SSE)
+live_hub = LiveHub()
+
+# Validadores precompilados a partir de las claves de respuestas del catálogo
+grader = Grader()
+
+def apply_report_change(change: Dict) -> None:
+    # Cambios guardados por cualquier worker (este incluido), leídos del registro de cambios
+    if change["op"] == changelog.UPSERT:
+        report = change["report"]
+        name_index.add(change["filename"], normalize_name(report.get("student_name", "")))
+        submission_dedup.add(submission_key(report))
+        if report_table is not None:
+            report_table.put(change["filename"], report)
+        # Una recalificación reemplaza la tarjeta en su sitio; un envío nuevo va arriba
+        live_hub.publish("update" if change.get("rewrite") else "report", report, change["seq"])
+    else:
+        name_index.remove(change["filename"])
+        if report_table is not None:
+            report_table.remove(change["filename"])
+        live_hub.publish("delete", {"filename": change["filename"]}, change["seq"])
+
+async def resync_reports(cursor: str) -> None:
+    # El worker se quedó atrás más que la retención del registro: se recarga todo y se
+    # sigue desde `cursor`
+    await run_io(lambda: name_index.rebuild(report_store.name_keys()))
+    # Claves de los envíos que guardaron otros workers mientras este no seguía el registro
+    await run_io(submission_dedup.rebuild)
+    if report_table is not None:
+        await run_io(report_table.load, report_store)
+    live_hub.resync(changelog.decode_cursor(cursor)[0])
+
+def warm_pages() -> None:
+    for challenge in challenge_catalog.refresh().items:
+        if "id" in challenge:
+            page_cache.get(challenge["id"], f"retos/{challenge['id']}/index.html")
+
+report_follower = ChangeFollower(report_store, generations, apply_report_change, resync_reports)
+report_follower.prime()
+live_hub.start_at(changelog.decode_cursor(report_follower.cursor)[0])
+
+# Calentamiento de cachés de este worker, en paralelo en el pool de almacenamiento
+warmups = [
+    lambda: name_index.rebuild(report_store.name_keys()),
+    submission_dedup.rebuild,
+    lambda: grader.sync(challenge_catalog.refresh()),
+    warm_pages,
+    asset_bundle.refresh,
+    image_manifest.refresh,
+]
+if report_table is not None:
+    warmups.append(lambda: report_table.load(report_store))
+storage.run_parallel(*warmups)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.loop_watch = asyncio.create_task(metrics.watch_event_loop())
+    app.state.report_follower = asyncio.create_task(report_follower.run())
+
+@app.on_event("shutdown")
+def close_storage():
+    app.state.loop_watch.cancel()
+    app.state.report_follower.cancel()
+    storage.shutdown()
+    report_store.close()
+
 # --- MODELOS DE DATOS (ACTUALIZADOS PARA SER DINÁMICOS) ---
 
 class StepEvidence(BaseModel):
@@ -35,26 +167,20 @@ class MissionSubmission(BaseModel):
     steps: List[StepEvidence]  # Lista dinámica que soporta de 1 a N pasos
     timestamp: Optional[str] = None
 
+class MissionBatch(BaseModel):
+    # Sin validar aquí: un envío malformado no debe rechazar al resto del lote
+    submissions: List[Dict]
+
+class AnswerKey(BaseModel):
+    answer: str
+    tolerance: float = 0.0  # Margen para respuestas numéricas (0 = exacta)
+
 class NewChallenge(BaseModel):
     id: str
     title: str
     desc: str
     html_content: str
-
-# --- FUNCIONES AUXILIARES ---
-
-def load_challenges_meta():
-    if os.path.exists(DB_CHALLENGES):
-        try:
-            with open(DB_CHALLENGES, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            return []
-    return []
-
-def save_challenges_meta(data):
-    with open(DB_CHALLENGES, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    answer_key: Optional[Dict[str, AnswerKey]] = None  # Ej: {"Paso 1": {"answer": "200"}}
 
 # --- RUTAS DE INTERFAZ (FRONTEND) ---
 
@@ -126,6 +252,10 @@ html_landing = """
                     <label class="block text-sm font-bold text-gray-600 mb-1">Código HTML generado por la Gema:</label>
                     <textarea id="newHtml" rows="10" class="w-full p-2 border rounded font-mono text-xs bg-gray-50" placeholder="Pega aquí el código del ejercicio..." required></textarea>
                 </div>
+                <div>
+                    <label class="block text-sm font-bold text-gray-600 mb-1">Clave de respuestas (opcional, una línea por paso):</label>
+                    <textarea id="newKey" rows="3" class="w-full p-2 border rounded font-mono text-xs bg-gray-50" placeholder="Paso 1 = 200&#10;Paso 2 = 3.5 ± 0.1&#10;Paso 3 = 1"></textarea>
+                </div>
                 <button type="submit" class="w-full bg-green-600 hover:bg-green-700 text-white font-bold py-3 rounded">PUBLICAR RETO</button>
             </form>
         </div>
@@ -213,13 +343,24 @@ html_landing = """
             document.getElementById('studentModal').classList.add('active');
         }
 
+        // "Paso 2 = 3.5 ± 0.1" -> {"Paso 2": {answer: "3.5", tolerance: 0.1}}
+        function parseAnswerKey(text) {
+            const key = {};
+            text.split('\\n').forEach(line => {
+                const m = line.match(/^\\s*(.+?)\\s*=\\s*(.+?)\\s*(?:(?:±|\\+-)\\s*([\\d.,]+))?\\s*$/);
+                if (m) key[m[1]] = { answer: m[2], tolerance: m[3] ? parseFloat(m[3].replace(',', '.')) : 0 };
+            });
+            return Object.keys(key).length ? key : null;
+        }
+
         async function submitNewChallenge(e) {
             e.preventDefault();
             const payload = {
                 id: document.getElementById('newId').value,
                 title: document.getElementById('newTitle').value,
                 desc: document.getElementById('newDesc').value,
-                html_content: document.getElementById('newHtml').value
+                html_content: document.getElementById('newHtml').value,
+                answer_key: parseAnswerKey(document.getElementById('newKey').value)
             };
             const res = await fetch('/api/create_challenge', {
                 method: 'POST',
@@ -232,6 +373,13 @@ html_landing = """
             } else alert("Error al crear el reto");
         }
 
+        function gradeIcon(r, qid) {
+            if (!r.grade || !(qid in r.grade.steps)) return '';
+            return r.grade.steps[qid]
+                ? '<i class="fas fa-check-circle text-green-500" title="Correcta"></i>'
+                : '<i class="fas fa-times-circle text-red-500" title="Incorrecta"></i>';
+        }
+
         async function searchStudentHistory() {
             const name = document.getElementById('studentSearchName').value;
             if(!name) return;
@@ -252,7 +400,7 @@ html_landing = """
                     // Renderizado dinámico de N pasos
                     stepsHtml = r.steps.map(s => `
                         <div class="bg-white p-3 border rounded shadow-sm">
-                            <strong class="text-indigo-700">${s.question_id}:</strong> ${s.answer}
+                            ${gradeIcon(r, s.question_id)} <strong class="text-indigo-700">${s.question_id}:</strong> ${s.answer}
                             <div class="mt-1 text-xs text-gray-600 bg-gray-50 p-2 rounded border border-dashed border-gray-200">
                                 <em>Razón:</em> ${s.reasoning}
                             </div>
@@ -265,7 +413,7 @@ html_landing = """
                 html += `
                     <div class="border p-4 rounded-lg bg-gray-50 shadow-sm mb-4">
                         <div class="flex justify-between font-bold text-gray-800 mb-3 border-b pb-2">
-                            <span>Misión: <span class="text-indigo-600">${r.challenge_id}</span></span>
+                            <span>Misión: <span class="text-indigo-600">${r.challenge_id}</span>${r.grade ? ` <span class="ml-2 text-xs bg-indigo-100 text-indigo-700 px-2 py-1 rounded-full">${r.grade.score}/${r.grade.total}</span>` : ''}</span>
                             <span class="text-gray-400 font-normal text-xs"><i class="far fa-clock"></i> ${r.timestamp}</span>
                         </div>
                         <div class="space-y-2">
@@ -285,8 +433,15 @@ html_landing = """
 				    const img1 = document.getElementById('random-img-1');
 				    const img2 = document.getElementById('random-img-2');
 				    
-				    img1.src = '/static/' + data.images[0];
-				    img2.src = '/static/' + data.images[1];
+				    // Miniaturas WebP del ancho justo (srcset) si el servidor las ofrece
+				    [img1, img2].forEach((img, i) => {
+				        const v = data.variants ? data.variants[i] : null;
+				        if (v && v.srcset) {
+				            img.sizes = '(min-width: 1024px) 560px, 100vw';
+				            img.srcset = v.srcset;
+				        }
+				        img.src = v ? v.src : '/static/' + data.images[i];
+				    });
 				    
 				    // Mostrar imágenes y ocultar los spinners de carga
 				    img1.onload = () => { img1.classList.remove('hidden'); document.getElementById('loader-img-1').classList.add('hidden'); };
@@ -316,56 +471,228 @@ html_admin_reports = """
             <h1 class="text-3xl font-bold text-gray-800"><i class="fas fa-folder-open text-blue-600"></i> Archivo Central de Evidencias</h1>
             <a href="/" class="bg-white text-gray-600 px-4 py-2 rounded shadow hover:text-blue-600 transition"><i class="fas fa-arrow-left"></i> Volver al Inicio</a>
         </div>
+        <form id="filters" onsubmit="applyFilters(event)" class="bg-white p-4 rounded-xl shadow mb-6 grid grid-cols-2 md:grid-cols-5 gap-3 text-sm">
+            <input type="text" id="fStudent" placeholder="Estudiante" class="p-2 border rounded">
+            <input type="text" id="fChallenge" placeholder="ID del reto" class="p-2 border rounded font-mono">
+            <input type="date" id="fFrom" class="p-2 border rounded" title="Desde">
+            <input type="date" id="fTo" class="p-2 border rounded" title="Hasta">
+            <button type="submit" class="bg-blue-600 hover:bg-blue-700 text-white font-bold rounded"><i class="fas fa-filter"></i> Filtrar</button>
+        </form>
+        <form id="textSearch" onsubmit="searchSteps(event)" class="bg-white p-4 rounded-xl shadow mb-6 flex gap-3 text-sm">
+            <input type="text" id="fText" placeholder='Buscar en respuestas y razonamientos (ej: energia, "paneles solares", calcul*)' class="flex-1 p-2 border rounded">
+            <button type="submit" class="bg-purple-600 hover:bg-purple-700 text-white font-bold rounded px-4"><i class="fas fa-search"></i> Buscar</button>
+        </form>
+        <div id="searchResults" class="hidden mb-6"></div>
+        <div class="flex justify-end gap-3 mb-4 text-sm">
+            <button onclick="exportReports('csv')" class="bg-white text-green-700 px-3 py-1 rounded shadow hover:bg-green-50"><i class="fas fa-file-csv"></i> Exportar CSV</button>
+            <button onclick="exportReports('ndjson')" class="bg-white text-gray-700 px-3 py-1 rounded shadow hover:bg-gray-50"><i class="fas fa-file-code"></i> Exportar NDJSON</button>
+        </div>
         <div id="list" class="grid grid-cols-1 md:grid-cols-2 gap-4"></div>
+        <div id="sentinel" class="text-center text-gray-400 py-6"></div>
     </div>
     
     <script>
         const pwd = new URLSearchParams(window.location.search).get('pwd');
-        
-        function loadReports() {
-            fetch('/api/all_reports?pwd='+pwd).then(r=>r.json()).then(data => {
-                if(data.error) {
-                    document.body.innerHTML = "<h2 class='text-red-500 text-center text-2xl mt-20'>Acceso Denegado</h2>";
-                } else if(data.length === 0) {
-                    document.getElementById('list').innerHTML = "<p class='text-gray-500'>No hay reportes guardados.</p>";
-                } else {
-                    document.getElementById('list').innerHTML = data.map(r => `
-                        <div class="bg-white p-5 shadow-lg rounded-xl border border-gray-200 relative">
-                            <button onclick="deleteReport('${r.filename}')" class="absolute top-4 right-4 text-gray-400 hover:text-red-500 transition" title="Borrar Reporte">
-                                <i class="fas fa-trash"></i>
-                            </button>
-                            <h3 class="text-xl font-bold text-gray-800 border-b pb-2 mb-2">${r.student_name}</h3>
-                            <p class="text-sm font-semibold text-blue-600 mb-1">Reto: ${r.challenge_id}</p>
-                            <div class="text-xs text-gray-500 mb-3"><i class="far fa-calendar-alt"></i> ${r.timestamp}</div>
-                            
-                            <details class="text-sm group">
-                                <summary class="cursor-pointer text-blue-500 font-semibold hover:text-blue-700 outline-none">Ver Detalles del Ejercicio</summary>
-                                <div class="bg-gray-50 p-3 mt-2 rounded border border-gray-200 space-y-2 max-h-60 overflow-y-auto">
-                                    ${r.steps ? r.steps.map(s => `
-                                        <div>
-                                            <span class="font-bold text-gray-700">${s.question_id}:</span> <span class="text-green-700 font-mono">${s.answer}</span>
-                                            <p class="text-xs text-gray-500 italic mt-1">"${s.reasoning}"</p>
-                                        </div>
-                                    `).join('<hr class="my-2 border-gray-200">') : '<span class="text-red-400">Datos antiguos o corruptos</span>'}
+        const PAGE_SIZE = 30;
+        let nextCursor = null;
+        let exhausted = false;
+        let loading = false;
+        let filters = {};
+
+        function gradeIcon(r, qid) {
+            if (!r.grade || !(qid in r.grade.steps)) return '';
+            return r.grade.steps[qid]
+                ? '<i class="fas fa-check-circle text-green-500" title="Correcta"></i>'
+                : '<i class="fas fa-times-circle text-red-500" title="Incorrecta"></i>';
+        }
+
+        function renderReport(r) {
+            return `
+                <div class="bg-white p-5 shadow-lg rounded-xl border border-gray-200 relative" data-filename="${r.filename}">
+                    <button onclick="deleteReport('${r.filename}')" class="absolute top-4 right-4 text-gray-400 hover:text-red-500 transition" title="Borrar Reporte">
+                        <i class="fas fa-trash"></i>
+                    </button>
+                    <h3 class="text-xl font-bold text-gray-800 border-b pb-2 mb-2">${r.student_name}</h3>
+                    <p class="text-sm font-semibold text-blue-600 mb-1">Reto: ${r.challenge_id}${r.grade ? ` <span class="ml-2 text-xs bg-blue-100 text-blue-700 px-2 py-1 rounded-full">Puntaje: ${r.grade.score}/${r.grade.total}</span>` : ''}</p>
+                    <div class="text-xs text-gray-500 mb-3"><i class="far fa-calendar-alt"></i> ${r.timestamp}</div>
+                    
+                    <details class="text-sm group">
+                        <summary class="cursor-pointer text-blue-500 font-semibold hover:text-blue-700 outline-none">Ver Detalles del Ejercicio</summary>
+                        <div class="bg-gray-50 p-3 mt-2 rounded border border-gray-200 space-y-2 max-h-60 overflow-y-auto">
+                            ${r.steps ? r.steps.map(s => `
+                                <div>
+                                    ${gradeIcon(r, s.question_id)} <span class="font-bold text-gray-700">${s.question_id}:</span> <span class="text-green-700 font-mono">${s.answer}</span>
+                                    <p class="text-xs text-gray-500 italic mt-1">"${s.reasoning}"</p>
                                 </div>
-                            </details>
+                            `).join('<hr class="my-2 border-gray-200">') : '<span class="text-red-400">Datos antiguos o corruptos</span>'}
                         </div>
-                    `).join('');
-                }
+                    </details>
+                </div>
+            `;
+        }
+
+        // Sólo se pide (y se pinta) la siguiente página cuando el centinela entra en pantalla
+        async function loadNextPage() {
+            if (loading || exhausted) return;
+            loading = true;
+            const sentinel = document.getElementById('sentinel');
+            sentinel.innerHTML = '<i class="fas fa-spinner fa-spin"></i>';
+
+            const params = new URLSearchParams({ pwd: pwd, limit: PAGE_SIZE, ...filters });
+            if (nextCursor) params.set('cursor', nextCursor);
+            const data = await fetch('/api/all_reports?' + params).then(r => r.json());
+            loading = false;
+
+            if (data.error) {
+                document.body.innerHTML = "<h2 class='text-red-500 text-center text-2xl mt-20'>Acceso Denegado</h2>";
+                return;
+            }
+            const list = document.getElementById('list');
+            if (!nextCursor && data.items.length === 0) {
+                list.innerHTML = "<p class='text-gray-500'>No hay reportes guardados.</p>";
+            } else {
+                list.insertAdjacentHTML('beforeend', data.items.map(renderReport).join(''));
+            }
+            nextCursor = data.next_cursor;
+            exhausted = !nextCursor;
+            sentinel.innerHTML = exhausted ? '' : '<span class="text-xs">Desliza para cargar más...</span>';
+            // Si la página no llenó la pantalla, el observador no vuelve a disparar
+            if (!exhausted && sentinel.getBoundingClientRect().top < window.innerHeight) loadNextPage();
+        }
+
+        // Nombres sin tildes ni mayúsculas, como normalize_name() en el servidor
+        function normalizeName(s) {
+            return (s || '').normalize('NFKD').replace(/[\\u0300-\\u036f]/g, '').toLowerCase().replace(/\\s+/g, ' ').trim();
+        }
+
+        function matchesFilters(r) {
+            if (filters.challenge_id && r.challenge_id !== filters.challenge_id) return false;
+            const day = r.filename.slice(0, 8);
+            if (filters.date_from && day < filters.date_from.replaceAll('-', '')) return false;
+            if (filters.date_to && day > filters.date_to.replaceAll('-', '')) return false;
+            if (filters.student && !normalizeName(r.student_name).includes(normalizeName(filters.student))) return false;
+            return true;
+        }
+
+        // Canal en vivo: sólo se insertan o quitan las tarjetas afectadas
+        function connectLive() {
+            const source = new EventSource('/api/live_reports?pwd=' + encodeURIComponent(pwd));
+            source.addEventListener('report', e => {
+                const r = JSON.parse(e.data);
+                if (!matchesFilters(r) || document.querySelector(`[data-filename="${CSS.escape(r.filename)}"]`)) return;
+                const list = document.getElementById('list');
+                if (!list.querySelector('[data-filename]')) list.innerHTML = '';
+                list.insertAdjacentHTML('afterbegin', renderReport(r));
+            });
+            source.addEventListener('update', e => {
+                const r = JSON.parse(e.data);
+                const card = document.querySelector(`[data-filename="${CSS.escape(r.filename)}"]`);
+                if (card) card.outerHTML = renderReport(r);
             });
+            source.addEventListener('delete', e => {
+                const card = document.querySelector(`[data-filename="${CSS.escape(JSON.parse(e.data).filename)}"]`);
+                if (card) card.remove();
+            });
+            // Se perdieron eventos (cliente lento o reconexión tardía): se recarga la lista
+            source.addEventListener('resync', resetList);
+        }
+
+        function resetList() {
+            nextCursor = null;
+            exhausted = false;
+            document.getElementById('list').innerHTML = '';
+            loadNextPage();
+        }
+
+        function applyFilters(e) {
+            e.preventDefault();
+            filters = {};
+            const student = document.getElementById('fStudent').value.trim();
+            const challenge = document.getElementById('fChallenge').value.trim();
+            const from = document.getElementById('fFrom').value;
+            const to = document.getElementById('fTo').value;
+            if (student) filters.student = student;
+            if (challenge) filters.challenge_id = challenge;
+            if (from) filters.date_from = from;
+            if (to) filters.date_to = to;
+            resetList();
+        }
+        
+        let searchQuery = '';
+        let searchOffset = 0;
+
+        function esc(s) {
+            return String(s ?? '').replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'}[c]));
+        }
+
+        function renderHit(h) {
+            // El fragmento marca las coincidencias con « »
+            const snippet = esc(h.snippet).replaceAll('«', '<mark>').replaceAll('»', '</mark>');
+            return `
+                <div class="bg-white p-3 mb-2 rounded-lg shadow text-sm">
+                    <span class="font-bold text-gray-800">${esc(h.student_name)}</span>
+                    <span class="text-xs font-mono text-blue-600 ml-2">${esc(h.challenge_id)}</span>
+                    <span class="text-xs text-gray-400 ml-2">${esc(h.question_id)}</span>
+                    <span class="font-mono text-green-700 ml-2">${esc(h.answer)}</span>
+                    <p class="text-xs text-gray-600 mt-1">${snippet}</p>
+                </div>`;
+        }
+
+        async function searchSteps(e, more) {
+            if (e) e.preventDefault();
+            const box = document.getElementById('searchResults');
+            if (!more) {
+                searchQuery = document.getElementById('fText').value.trim();
+                searchOffset = 0;
+                box.innerHTML = '';
+            }
+            if (!searchQuery) {
+                box.classList.add('hidden');
+                return;
+            }
+            // Usa también el reto del filtro de arriba, si hay uno
+            const params = new URLSearchParams({ pwd: pwd, q: searchQuery, offset: searchOffset });
+            if (filters.challenge_id) params.set('challenge_id', filters.challenge_id);
+            const res = await fetch('/api/search?' + params);
+            const data = await res.json();
+            box.classList.remove('hidden');
+            const moreButton = document.getElementById('moreHits');
+            if (moreButton) moreButton.remove();
+            if (!res.ok) {
+                box.innerHTML = `<p class="text-red-500 text-center">${esc(data.detail)}</p>`;
+                return;
+            }
+            if (!more && !data.items.length) {
+                box.innerHTML = '<p class="text-gray-500 text-center">Sin resultados</p>';
+                return;
+            }
+            box.insertAdjacentHTML('beforeend', data.items.map(renderHit).join(''));
+            if (data.next_offset !== null) {
+                searchOffset = data.next_offset;
+                box.insertAdjacentHTML('beforeend', '<button id="moreHits" onclick="searchSteps(null, true)" class="text-sm text-purple-700 hover:underline">Ver más resultados</button>');
+            }
+        }
+
+        function exportReports(format) {
+            const params = new URLSearchParams({ pwd: pwd, format: format, ...filters });
+            window.location.href = '/api/export_reports?' + params;
         }
         
         async function deleteReport(filename) {
             if(!confirm("¿Borrar este reporte de estudiante permanentemente?")) return;
             const res = await fetch(`/api/delete_report/${filename}?pwd=${pwd}`, { method: 'DELETE' });
             if(res.ok) {
-                loadReports();
+                const card = document.querySelector(`[data-filename="${CSS.escape(filename)}"]`);
+                if (card) card.remove();
             } else {
                 alert("Error al borrar el reporte.");
             }
         }
 
-        loadReports();
+        new IntersectionObserver(entries => {
+            if (entries[0].isIntersecting) loadNextPage();
+        }, { rootMargin: '400px' }).observe(document.getElementById('sentinel'));
+        connectLive();
     </script>
 </body></html>
 """
@@ -374,126 +701,338 @@ html_admin_reports = """
 
 @app.get("/", response_class=HTMLResponse)
 async def home():
-    return html_landing
+    # Con static/bundle generado, los CDN se sustituyen por el CSS propio
+    bundle = await run_io(asset_bundle.refresh)
+    return bundle.page("landing", html_landing)
 
 @app.get("/admin_panel", response_class=HTMLResponse)
 async def admin_page(pwd: str):
-    return html_admin_reports
+    bundle = await run_io(asset_bundle.refresh)
+    return bundle.page("admin_reports", html_admin_reports)
+
+@app.get("/metrics")
+async def get_metrics():
+    # Formato de texto de Prometheus (scrape_configs -> metrics_path: /metrics)
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/api/challenges")
-async def get_challenges():
-    return load_challenges_meta()
+async def get_challenges(request: Request):
+    catalog = await run_io(challenge_catalog.refresh)
+    headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == catalog.etag:
+        return Response(status_code=304, headers=headers)
+    return Response(catalog.body, media_type="application/json", headers=headers)
 
 @app.get("/reto/{challenge_id}")
-async def serve_challenge(challenge_id: str):
+async def serve_challenge(challenge_id: str, request: Request):
     if ".." in challenge_id or "/" in challenge_id:
         raise HTTPException(400, "ID inválido")
     
     path = f"retos/{challenge_id}/index.html"
-    if not os.path.exists(path):
+    page = await run_io(page_cache.get, challenge_id, path)
+    if page is None:
         raise HTTPException(404, "Reto no encontrado. Verifica la carpeta.")
-    return FileResponse(path)
+    
+    encoding = negotiate(request.headers.get("accept-encoding", ""), page.variants)
+    etag = page.etag(encoding)
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(page.variants[encoding], media_type="text/html; charset=utf-8", headers=headers)
 
 @app.post("/api/create_challenge")
-async def create_challenge(data: NewChallenge):
+async def create_challenge(data: NewChallenge, background_tasks: BackgroundTasks):
     dir_path = f"retos/{data.id}"
-    os.makedirs(dir_path, exist_ok=True)
-    
     html_path = f"{dir_path}/index.html"
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(data.html_content)
+    # El HTML de la Gema trae los CDN y se guarda tal cual: el paquete actual no tiene las
+    # clases nuevas de este reto. Si hay binario local, la reconstrucción de abajo lo incluye
+    # y después reescribe la página para apuntar al paquete; si no, sigue usando el CDN.
+    # index.html + variantes .gz/.br + hash, para servirlas sin comprimir en cada visita
+    await run_io(write_page, html_path, data.html_content.encode("utf-8"))
+    page_cache.invalidate(data.id)
     
-    meta = load_challenges_meta()
-    existing = next((item for item in meta if item["id"] == data.id), None)
-    if existing:
-        existing.update({
-            "title": data.title,
-            "desc": data.desc,
-            "date": datetime.now().strftime("%Y-%m-%d")
-        })
-    else:
-        meta.append({
-            "id": data.id,
-            "title": data.title,
-            "desc": data.desc,
-            "path": html_path,
-            "date": datetime.now().strftime("%Y-%m-%d")
-        })
-    save_challenges_meta(meta)
-    return {"status": "ok"}
-
-@app.post("/api/submit")
-async def submit_mission(submission: MissionSubmission):
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    submission.timestamp = timestamp
+    previous = (await run_io(challenge_catalog.refresh)).by_id.get(data.id) or {}
+    answer_key = {qid: k.model_dump() for qid, k in data.answer_key.items()} if data.answer_key else None
     
-    # Sanitización estricta del nombre para el archivo
-    safe_name = "".join(x for x in submission.student_name if x.isalnum() or x.isspace()).strip().replace(" ", "_")
+    # Escritura atómica y serializada entre peticiones y entre workers
+    await challenge_catalog.upsert({
+        "id": data.id,
+        "title": data.title,
+        "desc": data.desc,
+        "path": html_path,
+        "date": datetime.now().strftime("%Y-%m-%d"),
+        "answer_key": answer_key
+    })
+    
+    # Si la clave cambió, se recalifican en segundo plano los reportes de este reto.
+    # Los de meses archivados conservan su calificación: se informa cuántos son
+    response = {"status": "ok"}
+    grader.sync(challenge_catalog)
+    if previous.get("answer_key") != answer_key:
+        background_tasks.add_task(run_io, regrade_challenge, data.id)
+        response["regrade_skipped_archived"] = await run_io(report_store.archive.count, data.id)
+    # Las clases Tailwind nuevas de este reto entran en el paquete (si hay binario local)
+    # y la página pasa a apuntar a él
+    background_tasks.add_task(run_io, rebuild_if_possible, "retos")
+    return response
+
+def regrade_challenge(challenge_id: str) -> None:
+    updated, skipped = regrade(report_store, grader, challenge_id)
+    if skipped:
+        print(f"Recalificación de {challenge_id}: {updated} reportes; {skipped} sin cambiar por estar archivados")
+
+def prepare_report(submission: MissionSubmission):
+    # Bloqueante (el ID toma el candado de archivo del estado compartido): vía run_io
+    # Sanitización estricta del nombre para el ID del reporte
+    safe_name = clean_name(submission.student_name).replace(" ", "_")
     if not safe_name:
         safe_name = "estudiante_anonimo"
         
-    filename = f"reportes/{datetime.now().strftime('%Y%m%d_%H%M%S')}_{safe_name}_{submission.challenge_id}.json"
+    filename, moment = report_ids.next(safe_name, submission.challenge_id)
+    submission.timestamp = moment.strftime("%Y-%m-%d %H:%M:%S")
     
-    # IMPORTANTE: Usamos model_dump() y json.dump con ensure_ascii=False para evitar corrupción de datos
-    with open(filename, "w", encoding="utf-8") as f:
-        # En Pydantic v2 es model_dump(). Si usas v1, cámbialo a submission.dict()
-        json.dump(submission.model_dump(), f, ensure_ascii=False, indent=4)
-        
-    return {"message": "Guardado correctamente"}
+    # En Pydantic v2 es model_dump(). Si usas v1, cámbialo a submission.dict()
+    report = submission.model_dump()
+    grade = grader.grade(submission.challenge_id, report["steps"])
+    if grade is not None:
+        report["grade"] = grade
+    return filename, report, grade
+
+@app.post("/api/submit")
+async def submit_mission(submission: MissionSubmission = Depends(json_body(MissionSubmission))):
+    async def save() -> Dict:
+        grader.sync(await run_io(challenge_catalog.refresh))
+        filename, report, grade = await run_io(prepare_report, submission)
+        # Sólo se responde cuando el lote que contiene este envío ya está en disco
+        await submit_pipeline.submit(filename, report)
+        name_index.add(filename, normalize_name(submission.student_name))
+        if report_table is not None:
+            report_table.put(filename, report)
+        return {"grade": grade}
+
+    # Un reenvío de la misma misión devuelve la calificación original sin escribir nada
+    result, duplicate = await submission_dedup.once(submission_key(submission.model_dump()), save)
+    return {"message": "Guardado correctamente", "grade": result["grade"], "duplicate": duplicate}
+
+@app.post("/api/submit_batch")
+async def submit_batch(batch: MissionBatch = Depends(json_body(MissionBatch))):
+    # Envíos acumulados sin conexión: se guardan todos en una sola transacción y cada uno
+    # recibe su resultado. Si falla el guardado, la petición entera falla (503) y el
+    # cliente conserva su cola para reintentar.
+    if len(batch.submissions) > MAX_SUBMIT_BATCH:
+        raise HTTPException(status_code=413, detail=f"Máximo {MAX_SUBMIT_BATCH} envíos por lote")
+
+    grader.sync(await run_io(challenge_catalog.refresh))
+    submissions: List[Optional[MissionSubmission]] = []
+    results: List[Dict] = []
+    for item in batch.submissions:
+        try:
+            submissions.append(MissionSubmission.model_validate(item))
+            results.append({"status": "ok"})
+        except ValidationError as e:
+            # Inválido para siempre: el cliente lo descarta en vez de reintentarlo
+            submissions.append(None)
+            results.append({"status": "error", "detail": e.errors(include_url=False, include_context=False)})
+
+    # Cada clave se marca en curso (como en /api/submit) antes de buscar el original, así un
+    # reintento directo que llegue mientras tanto espera este resultado en vez de guardarlo otra vez
+    keys = [submission_key(s.model_dump()) if s else None for s in submissions]
+    claimed = [k for k in dict.fromkeys(keys) if k and submission_dedup.claim(k)]
+    accepted = []
+    fresh = []
+    repeated = []
+    waiting = []
+    first_in_batch: Dict[str, Dict] = {}
+    try:
+        originals = await run_io(lambda: {k: submission_dedup.lookup(k) for k in claimed})
+        claimed_set = set(claimed)
+        for submission, key, result in zip(submissions, keys, results):
+            if submission is None:
+                continue
+            if key not in claimed_set:
+                # El mismo envío está entrando ahora mismo por otra petición
+                waiting.append((submission_dedup.pending(key), result))
+            elif originals.get(key) is not None:
+                result.update(grade=originals[key].get("grade"), duplicate=True)
+                first_in_batch[key] = result
+            elif key in first_in_batch:
+                repeated.append((key, result))
+            else:
+                fresh.append((submission, key, result))
+                first_in_batch[key] = result
+
+        # IDs y calificaciones en el pool: el ID toma el candado de archivo del estado compartido
+        prepared = await run_io(lambda: [prepare_report(submission) for submission, _, _ in fresh])
+        for (submission, key, result), (filename, report, grade) in zip(fresh, prepared):
+            accepted.append((filename, report, submission.student_name, key))
+            result.update(grade=grade, duplicate=False)
+        for key, result in repeated:
+            result.update(grade=first_in_batch[key]["grade"], duplicate=True)
+
+        if accepted:
+            try:
+                await run_io(report_store.add_many, [(filename, report) for filename, report, _, _ in accepted])
+            except Exception as e:
+                print(f"Error guardando lote de {len(accepted)} envíos: {e}")
+                raise HTTPException(status_code=503, detail="No se pudo guardar el lote, reintenta")
+            for filename, report, student_name, key in accepted:
+                name_index.add(filename, normalize_name(student_name))
+                submission_dedup.add(key)
+                if report_table is not None:
+                    report_table.put(filename, report)
+    except BaseException as e:
+        for key in claimed:
+            submission_dedup.release(key, error=e)
+        raise
+    for key in claimed:
+        submission_dedup.release(key, {"grade": first_in_batch[key]["grade"]})
+
+    # Después de liberar las claves propias: dos lotes que se esperan mutuamente no se bloquean
+    for pending, result in waiting:
+        try:
+            result.update(grade=(await asyncio.shield(pending))["grade"], duplicate=True)
+        except Exception:
+            # La otra petición no llegó a guardarlo: el cliente reintenta el lote entero
+            raise HTTPException(status_code=503, detail="No se pudo guardar el lote, reintenta")
+
+    return FastJSONResponse({"saved": len(accepted), "results": results})
 
 @app.get("/api/all_reports")
-async def get_all_reports(pwd: str):
+async def get_all_reports(
+    pwd: str,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    challenge_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    student: Optional[str] = None,
+):
     if pwd != "admin":
         return {"error": "Unauthorized"}
     
-    results = []
-    files = sorted(os.listdir("reportes"), reverse=True)
-    for filename in files:
-        if filename.endswith(".json"):
-            try:
-                with open(f"reportes/{filename}", "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    data["filename"] = filename # Inyectamos el nombre de archivo para poder borrarlo
-                    results.append(data)
-            except Exception as e:
-                print(f"Error leyendo {filename}: {e}")
-                continue
-    return results
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    try:
+        items, next_cursor = await run_io(
+            report_reader.page, limit, cursor, challenge_id, date_from, date_to, student
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    # Cada reporte ya incluye "filename" para poder borrarlo desde el panel. Se devuelve la
+    # respuesta ya construida: los reportes son dicts de JSON, no hace falta jsonable_encoder.
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
 
-@app.get("/api/student_history")
-async def get_student_history(name: str):
-    results = []
-    files = sorted(os.listdir("reportes"), reverse=True)
-    query_name = name.lower().strip()
+@app.get("/api/reports/changes")
+async def get_report_changes(pwd: str, since: Optional[str] = None, limit: int = 500):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    # Altas/reescrituras y bajas posteriores al cursor `since` (sin él: todo el conjunto).
+    # Con reset=true hay que vaciar la copia local y volver a empezar sin `since`.
+    limit = max(1, min(limit, changelog.MAX_CHANGES_PAGE))
+    try:
+        return FastJSONResponse(await run_io(report_store.changes, since, limit))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+@app.get("/api/live_reports")
+async def live_reports(pwd: str, request: Request):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    # Server-Sent Events: el panel recibe altas y bajas sin volver a pedir la lista
+    return StreamingResponse(
+        live_hub.stream(request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/export_reports")
+async def export_reports(
+    pwd: str,
+    format: str = "csv",
+    challenge_id: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    student: Optional[str] = None,
+):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    if format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Formato inválido: usa csv o ndjson")
     
-    for filename in files:
-        if filename.endswith(".json"):
-            try:
-                with open(f"reportes/{filename}", "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    if query_name in data.get("student_name", "").lower():
-                        results.append(data)
-            except Exception:
-                continue
-    return results
+    # Mismos filtros que /api/all_reports; se envía fila a fila sin armar la lista completa
+    rows = aiter_export(
+        report_store, format,
+        challenge_id=challenge_id, date_from=date_from, date_to=date_to, student=student,
+    )
+    media_type = "text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson"
+    filename = f"evidencias_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{format}"
+    return StreamingResponse(
+        rows, media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/api/analytics")
+async def get_analytics(pwd: str, challenge_id: Optional[str] = None):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    # Agregados mantenidos al guardar/borrar: no se recorre ningún reporte
+    return FastJSONResponse(await run_io(report_store.get_analytics, challenge_id))
+
+@app.get("/api/search")
+async def search_steps(pwd: str, q: str, challenge_id: Optional[str] = None, limit: int = 20, offset: int = 0):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    if not report_store.search_enabled:
+        raise HTTPException(status_code=503, detail="Búsqueda no disponible: SQLite sin FTS5")
+    # Pasos (respuesta + razonamiento) que contienen todas las palabras, los más relevantes primero
+    limit = max(1, min(limit, search_index.MAX_SEARCH_PAGE))
+    hits, next_offset = await run_io(report_store.search, q, challenge_id, limit, max(0, offset))
+    return FastJSONResponse({"items": hits, "next_offset": next_offset})
+
+@app.get("/api/profiles")
+async def list_profiles(pwd: str):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    # Los más lentos primero; vacío si PROFILER no está activo
+    return {"enabled": bool(profiler.PROFILER_MODE), "profiles": profiler.recorder.list()}
+
+@app.get("/api/profiles/{profile_id}")
+async def download_profile(profile_id: int, pwd: str, format: str = "collapsed"):
+    if pwd != "admin":
+        raise HTTPException(status_code=401, detail="Contraseña incorrecta")
+    if format not in ("collapsed", "pstats"):
+        raise HTTPException(status_code=400, detail="Formato inválido: usa collapsed o pstats")
+    profile = profiler.recorder.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado")
+    
+    if format == "pstats":
+        body, media_type = profile.pstats(), "application/octet-stream"
+    else:
+        body, media_type = profile.collapsed(), "text/plain; charset=utf-8"
+    return Response(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="perfil_{profile_id}.{format}"'
+    })
+
+@app.get("/api/student_history")
+async def get_student_history(name: str, prefix: bool = False):
+    # Sin tildes ni mayúsculas: "maria" encuentra a "María"
+    return FastJSONResponse(await run_io(report_reader.get_many, name_index.search(name, prefix=prefix)))
 
 @app.delete("/api/delete_challenge/{challenge_id}")
 async def delete_challenge(challenge_id: str, pwd: str):
     if pwd != "admin":
         raise HTTPException(status_code=401, detail="Contraseña incorrecta")
     
-    meta = load_challenges_meta()
-    new_meta = [c for c in meta if c["id"] != challenge_id]
-    
-    if len(new_meta) == len(meta):
+    if not await challenge_catalog.remove(challenge_id):
         raise HTTPException(status_code=404, detail="Reto no encontrado en la base de datos")
     
-    save_challenges_meta(new_meta)
-    
+    page_cache.invalidate(challenge_id)
     dir_path = f"retos/{challenge_id}"
-    if os.path.exists(dir_path):
+    if await storage.exists(dir_path):
         try:
-            shutil.rmtree(dir_path)
+            await storage.rmtree(dir_path)
         except Exception as e:
             print(f"Error borrando carpeta: {e}")
             
@@ -509,24 +1048,24 @@ async def delete_report(filename: str, pwd: str):
     if "/" in filename or ".." in filename:
         raise HTTPException(status_code=400, detail="Nombre de archivo inválido")
         
-    file_path = f"reportes/{filename}"
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            return {"status": "deleted", "filename": filename}
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error borrando archivo: {e}")
+    try:
+        deleted = await run_io(report_store.delete, filename)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error borrando reporte: {e}")
+    if deleted:
+        name_index.remove(filename)
+        if report_table is not None:
+            report_table.remove(filename)
+        return {"status": "deleted", "filename": filename}
             
     raise HTTPException(status_code=404, detail="Reporte no encontrado")
 
 @app.get("/api/random_images")
 async def get_random_images():
     # Buscamos archivos en la carpeta static que sean imágenes y empiecen con 'img'
-    valid_extensions = (".jpg", ".jpeg", ".png", ".webp", ".gif")
-    
+    # (lista en memoria; sólo se relee la carpeta si cambió)
     try:
-        files = [f for f in os.listdir(STATIC_DIR) 
-                 if f.lower().endswith(valid_extensions) and f.startswith("img")]
+        files = (await run_io(image_manifest.refresh)).images
         
         # Si hay 2 o más imágenes, escogemos 2 al azar sin repetir
         if len(files) >= 2:
@@ -538,6 +1077,19 @@ async def get_random_images():
         else:
             selected = []
             
-        return {"images": selected}
+        # "images" se mantiene por compatibilidad; "variants" trae src + srcset de miniaturas
+        return {"images": selected, "variants": [image_manifest.describe(f) for f in selected]}
     except Exception as e:
         return {"images": []}
+
+@app.get("/img/{width}/{name}")
+async def get_image_thumbnail(width: int, name: str):
+    # Miniatura WebP generada la primera vez y guardada en static/_miniaturas/
+    await run_io(image_manifest.refresh)
+    result = await run_io(image_manifest.thumbnail, name, width)
+    if result is None:
+        raise HTTPException(404, "Imagen no encontrada")
+    path, is_thumb = result
+    # La URL lleva ?v=<mtime del original>: si la foto cambia, cambia la URL
+    headers = {"Cache-Control": "public, max-age=31536000, immutable"} if is_thumb else {}
+    return FileResponse(path, media_type="image/webp" if is_thumb else None, headers=headers)
@@ -0,0 +1,254 @@
+import os
+import time
+import bisect
+import asyncio
+import threading
+import contextvars
+from typing import Dict, List, Optional, Tuple
+
+# --- MÉTRICAS (FORMATO DE TEXTO DE PROMETHEUS) ---
+# Contadores e histogramas en memoria, sin dependencias. El middleware mide cada petición
+# por plantilla de ruta ("/reto/{challenge_id}", no cada ID) para que el número de series
+# quede acotado. Las lecturas de almacenamiento (filas, archivos y bytes decodificados) se
+# acumulan por petición a través de una ContextVar que storage.run_io propaga al pool.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (128, 512, 2048, 8192, 32768, 131072, 524288, 2097152, 8388608)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+LOOP_LAG_INTERVAL = float(os.environ.get("METRICS_LOOP_LAG_INTERVAL", "0.5"))
+
+UNMATCHED_ROUTE = "(sin ruta)"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, amount: float = 1, labels: Tuple = ()) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in values]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labels: Tuple = ()) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Tuple[float, ...], labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.labelnames = labelnames
+        self._lock = threading.Lock()
+        # labels -> [conteo por cubeta (la última es +Inf), suma]
+        self._series: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, labels: Tuple = ()) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((k, list(v[0]), v[1]) for k, v in self._series.items())
+        lines = []
+        for labels, counts, total in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            suffix = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{suffix} {_format_value(total)}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> bytes:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "Peticiones atendidas por ruta, método y código.", ("route", "method", "status")))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Tiempo hasta enviar el último byte de la respuesta.", LATENCY_BUCKETS, ("route", "method")))
+http_request_size = registry.register(Histogram(
+    "http_request_size_bytes", "Tamaño del cuerpo recibido (Content-Length).", SIZE_BUCKETS, ("route",)))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Bytes de cuerpo enviados en la respuesta.", SIZE_BUCKETS, ("route",)))
+http_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "Peticiones en curso."))
+
+request_storage_ops = registry.register(Histogram(
+    "http_request_storage_operations", "Operaciones del pool de almacenamiento por petición.", COUNT_BUCKETS, ("route",)))
+request_storage_rows = registry.register(Histogram(
+    "http_request_storage_rows", "Reportes decodificados por petición.", COUNT_BUCKETS, ("route",)))
+request_storage_files = registry.register(Histogram(
+    "http_request_storage_files", "Archivos leídos de disco por petición.", COUNT_BUCKETS, ("route",)))
+request_storage_bytes = registry.register(Histogram(
+    "http_request_storage_bytes", "Bytes leídos y decodificados por petición.", SIZE_BUCKETS, ("route",)))
+
+storage_seconds = registry.register(Histogram(
+    "storage_operation_duration_seconds", "Tiempo de ejecución de cada operación en el pool.", LATENCY_BUCKETS, ("operation",)))
+storage_wait = registry.register(Histogram(
+    "storage_queue_wait_seconds", "Espera en cola antes de que un hilo del pool tome la operación.", LATENCY_BUCKETS))
+storage_rows = registry.register(Counter(
+    "storage_rows_read_total", "Reportes decodificados desde SQLite."))
+storage_files = registry.register(Counter(
+    "storage_files_read_total", "Archivos leídos de disco (catálogo, páginas de retos)."))
+storage_bytes = registry.register(Counter(
+    "storage_bytes_read_total", "Bytes leídos y decodificados."))
+
+report_table_rows = registry.register(Gauge(
+    "report_table_rows", "Reportes en la tabla compacta en memoria (report_table.py)."))
+report_table_bytes = registry.register(Gauge(
+    "report_table_bytes", "Memoria estimada de la tabla compacta de reportes."))
+
+loop_lag = registry.register(Histogram(
+    "event_loop_lag_seconds", "Retraso del event loop respecto a un temporizador periódico.", LATENCY_BUCKETS))
+loop_lag_last = registry.register(Gauge(
+    "event_loop_lag_last_seconds", "Último retraso medido del event loop."))
+
+
+# --- Acumulado de almacenamiento de la petición en curso ---
+# [operaciones, filas, archivos, bytes]; la lista es compartida con las copias del contexto
+_request_io: contextvars.ContextVar[Optional[list]] = contextvars.ContextVar("request_io", default=None)
+
+
+def record_read(rows: int = 0, files: int = 0, nbytes: int = 0) -> None:
+    if rows:
+        storage_rows.inc(rows)
+    if files:
+        storage_files.inc(files)
+    if nbytes:
+        storage_bytes.inc(nbytes)
+    acc = _request_io.get()
+    if acc is not None:
+        acc[1] += rows
+        acc[2] += files
+        acc[3] += nbytes
+
+
+def record_storage_op(operation: str, waited: float, elapsed: float) -> None:
+    storage_wait.observe(waited)
+    storage_seconds.observe(elapsed, (operation,))
+    acc = _request_io.get()
+    if acc is not None:
+        acc[0] += 1
+
+
+class MetricsMiddleware:
+    # Middleware ASGI puro (sin BaseHTTPMiddleware): sólo envuelve `send` para contar bytes
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        acc = [0, 0, 0, 0]
+        token = _request_io.set(acc)
+        state = {"status": 500, "sent": 0, "done": None}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    state["done"] = time.perf_counter()
+            await send(message)
+
+        http_in_flight.inc(1)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_in_flight.inc(-1)
+            _request_io.reset(token)
+            # Las tareas en segundo plano corren después del último byte: no cuentan como latencia
+            elapsed = (state["done"] or time.perf_counter()) - start
+            route = getattr(scope.get("route"), "path", None) or UNMATCHED_ROUTE
+            method = scope["method"]
+            http_requests.inc(1, (route, method, str(state["status"])))
+            http_latency.observe(elapsed, (route, method))
+            http_response_size.observe(state["sent"], (route,))
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    try:
+                        http_request_size.observe(int(value), (route,))
+                    except ValueError:
+                        pass
+                    break
+            request_storage_ops.observe(acc[0], (route,))
+            request_storage_rows.observe(acc[1], (route,))
+            request_storage_files.observe(acc[2], (route,))
+            request_storage_bytes.observe(acc[3], (route,))
+
+
+async def watch_event_loop(interval: float = LOOP_LAG_INTERVAL) -> None:
+    # Duerme `interval` y mide cuánto tarde despierta: el exceso es tiempo en que el loop
+    # estaba ocupado con otra cosa (JSON grande, trabajo síncrono fuera del pool...)
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        loop_lag.observe(lag)
+        loop_lag_last.set(lag)
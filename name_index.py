@@ -0,0 +1,108 @@
+import bisect
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set, Tuple
+
+# --- ÍNDICE DE NOMBRES DE ESTUDIANTES ---
+# Nombre normalizado -> IDs de reporte, con trigramas para búsquedas por subcadena.
+# Vive en memoria; la copia persistente es la columna name_key del almacén de reportes.
+
+NGRAM = 3
+
+
+def clean_name(name: str) -> str:
+    # Mismas reglas que el nombre de archivo de submit_mission: sólo letras, números y espacios
+    return "".join(x for x in name if x.isalnum() or x.isspace()).strip()
+
+
+def normalize_name(name: str) -> str:
+    # "  María   José " -> "maria jose"
+    decomposed = unicodedata.normalize("NFKD", clean_name(name))
+    no_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(no_accents.lower().split())
+
+
+def _ngrams(text: str) -> Set[str]:
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+
+class NameIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ids_by_name: Dict[str, Set[str]] = {}
+        self._name_by_id: Dict[str, str] = {}
+        self._names_by_gram: Dict[str, Set[str]] = {}
+        self._sorted_names: List[str] = []
+
+    def rebuild(self, entries: Iterable[Tuple[str, str]]) -> None:
+        # entries: pares (report_id, name_key) leídos del almacén al arrancar
+        with self._lock:
+            self._ids_by_name.clear()
+            self._name_by_id.clear()
+            self._names_by_gram.clear()
+            self._sorted_names = []
+            for report_id, name_key in entries:
+                self._add(report_id, name_key)
+
+    def add(self, report_id: str, name_key: str) -> None:
+        with self._lock:
+            self._add(report_id, name_key)
+
+    def _add(self, report_id: str, name_key: str) -> None:
+        ids = self._ids_by_name.get(name_key)
+        if ids is None:
+            ids = self._ids_by_name[name_key] = set()
+            bisect.insort(self._sorted_names, name_key)
+            for gram in _ngrams(name_key):
+                self._names_by_gram.setdefault(gram, set()).add(name_key)
+        ids.add(report_id)
+        self._name_by_id[report_id] = name_key
+
+    def remove(self, report_id: str) -> None:
+        with self._lock:
+            name_key = self._name_by_id.pop(report_id, None)
+            if name_key is None:
+                return
+            ids = self._ids_by_name[name_key]
+            ids.discard(report_id)
+            if ids:
+                return
+            # Último reporte con ese nombre: se quita de todas las estructuras
+            del self._ids_by_name[name_key]
+            del self._sorted_names[bisect.bisect_left(self._sorted_names, name_key)]
+            for gram in _ngrams(name_key):
+                names = self._names_by_gram.get(gram)
+                if names is not None:
+                    names.discard(name_key)
+                    if not names:
+                        del self._names_by_gram[gram]
+
+    def _prefix_names(self, query: str) -> List[str]:
+        start = bisect.bisect_left(self._sorted_names, query)
+        end = bisect.bisect_left(self._sorted_names, query + "\uffff")
+        return self._sorted_names[start:end]
+
+    def _substring_names(self, query: str) -> List[str]:
+        if len(query) < NGRAM:
+            # Consultas muy cortas: se recorren los nombres distintos (no los reportes)
+            return [n for n in self._sorted_names if query in n]
+        candidates = None
+        for gram in _ngrams(query):
+            names = self._names_by_gram.get(gram)
+            if not names:
+                return []
+            candidates = set(names) if candidates is None else candidates & names
+        return [n for n in candidates if query in n]
+
+    def search(self, query: str, prefix: bool = False) -> List[str]:
+        # Devuelve IDs de reporte, más recientes primero (los IDs llevan prefijo de fecha)
+        key = normalize_name(query)
+        if not key:
+            return []
+        with self._lock:
+            names = self._prefix_names(key) if prefix else self._substring_names(key)
+            ids = [report_id for n in names for report_id in self._ids_by_name[n]]
+        return sorted(ids, reverse=True)
+
+    def __len__(self) -> int:
+        return len(self._name_by_id)
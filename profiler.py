@@ -0,0 +1,268 @@
+import os
+import sys
+import time
+import heapq
+import marshal
+import threading
+import itertools
+import contextvars
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+import storage
+
+# --- PERFILADO BAJO DEMANDA DE PETICIONES ---
+# Muestreo de pilas (sys._current_frames) mientras dura una petición perfilada, tanto del
+# hilo del event loop como de los hilos del pool de almacenamiento que trabajan para ella.
+# Se guardan los PROFILE_KEEP perfiles más lentos; /api/profiles los descarga como pstats
+# (snakeviz, `python -m pstats`) o como pilas colapsadas (flamegraph.pl, speedscope).
+#
+# PROFILER=""        desactivado: ni middleware ni gancho en storage (coste cero)
+# PROFILER="header"  sólo peticiones con la cabecera "X-Profile: <contraseña admin>"
+# PROFILER="all"     todas las peticiones a PROFILE_ROUTES
+#
+# Nota: el hilo del event loop es compartido; sus muestras pueden incluir trabajo de otras
+# peticiones concurrentes. Las de los hilos del pool sí son exclusivas de la petición.
+
+PROFILER_MODE = os.environ.get("PROFILER", "").strip().lower()
+PROFILE_ROUTES = tuple(
+    r for r in os.environ.get("PROFILE_ROUTES", "/api/all_reports,/api/student_history").split(",") if r
+)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "20"))
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "2")) / 1000
+MAX_DEPTH = 128
+
+Func = Tuple[str, int, str]  # (archivo, línea, función), igual que las claves de pstats
+
+
+def _stack(frame) -> Tuple[Func, ...]:
+    funcs = []
+    while frame is not None and len(funcs) < MAX_DEPTH:
+        code = frame.f_code
+        funcs.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    funcs.reverse()
+    return tuple(funcs)
+
+
+class _Session:
+    def __init__(self, loop_thread: int):
+        self._lock = threading.Lock()
+        # id de hilo -> [nombre, llamadas activas]; el del event loop siempre está
+        self.threads: Dict[int, list] = {loop_thread: ["event-loop", 1]}
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+    def attach(self, thread_id: int, name: str) -> None:
+        with self._lock:
+            entry = self.threads.setdefault(thread_id, [name, 0])
+            entry[1] += 1
+
+    def detach(self, thread_id: int) -> None:
+        with self._lock:
+            entry = self.threads.get(thread_id)
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self.threads[thread_id]
+
+    def sample(self, frames: Dict) -> None:
+        with self._lock:
+            threads = [(tid, entry[0]) for tid, entry in self.threads.items()]
+        for tid, name in threads:
+            frame = frames.get(tid)
+            if frame is not None:
+                self.stacks[(name, _stack(frame))] += 1
+        self.samples += 1
+
+
+class Profile:
+    def __init__(self, profile_id: int, method: str, path: str, query: str, status: int,
+                 duration: float, stacks: Counter, samples: int, interval: float):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.query = query
+        self.status = status
+        self.duration = duration
+        self.stacks = stacks
+        self.samples = samples
+        self.interval = interval
+        self.at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    def summary(self) -> Dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path + ("?" + self.query if self.query else ""),
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 2),
+            "samples": self.samples,
+            "at": self.at,
+        }
+
+    def collapsed(self) -> str:
+        # Una línea por pila: "hilo;f1;f2;...;hoja <muestras>"
+        lines = []
+        for (thread, stack), n in sorted(self.stacks.items()):
+            frames = [thread] + [
+                f"{name} ({os.path.basename(filename)}:{line})".replace(";", ",") for filename, line, name in stack
+            ]
+            lines.append(";".join(frames) + f" {n}")
+        return "\n".join(lines) + "\n"
+
+    def pstats(self) -> bytes:
+        # Mismo formato que cProfile.Profile.dump_stats: {func: (cc, nc, tt, ct, callers)}.
+        # Con muestreo, "llamadas" son muestras y los tiempos son muestras * intervalo.
+        stats: Dict[Func, list] = {}
+        for (_, stack), n in self.stacks.items():
+            dt = n * self.interval
+            seen = set()
+            for i, func in enumerate(stack):
+                entry = stats.setdefault(func, [0, 0, 0.0, 0.0, {}])
+                leaf = i == len(stack) - 1
+                if func not in seen:
+                    seen.add(func)
+                    entry[0] += n
+                    entry[1] += n
+                    entry[3] += dt
+                if leaf:
+                    entry[2] += dt
+                if i > 0:
+                    edge = entry[4].setdefault(stack[i - 1], [0, 0, 0.0, 0.0])
+                    edge[0] += n
+                    edge[1] += n
+                    edge[3] += dt
+                    if leaf:
+                        edge[2] += dt
+        return marshal.dumps({
+            func: (cc, nc, tt, ct, {caller: tuple(edge) for caller, edge in callers.items()})
+            for func, (cc, nc, tt, ct, callers) in stats.items()
+        })
+
+
+class ProfileRecorder:
+    def __init__(self, keep: int = PROFILE_KEEP, interval: float = PROFILE_INTERVAL):
+        self.keep = keep
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        # Montículo de mínimos por duración: el más rápido sale cuando llega uno más lento
+        self._heap: List[Tuple[float, int, Profile]] = []
+        self._active: List[_Session] = []
+        self._wake = threading.Condition(self._lock)
+        self._sampler: Optional[threading.Thread] = None
+
+    def _run_sampler(self) -> None:
+        while True:
+            with self._lock:
+                while not self._active:
+                    self._wake.wait()
+                sessions = list(self._active)
+            frames = sys._current_frames()
+            for session in sessions:
+                session.sample(frames)
+            del frames
+            time.sleep(self.interval)
+
+    def start(self, loop_thread: int) -> _Session:
+        session = _Session(loop_thread)
+        with self._lock:
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._run_sampler, name="profiler", daemon=True)
+                self._sampler.start()
+            self._active.append(session)
+            self._wake.notify()
+        return session
+
+    def stop(self, session: _Session, method: str, path: str, query: str, status: int, duration: float) -> None:
+        with self._lock:
+            self._active.remove(session)
+            if len(self._heap) >= self.keep and duration <= self._heap[0][0]:
+                return
+            profile_id = next(self._ids)
+        profile = Profile(profile_id, method, path, query, status, duration,
+                          session.stacks, session.samples, self.interval)
+        with self._lock:
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, (duration, profile_id, profile))
+            else:
+                heapq.heappushpop(self._heap, (duration, profile_id, profile))
+
+    def list(self) -> List[Dict]:
+        with self._lock:
+            profiles = [p for _, _, p in self._heap]
+        return [p.summary() for p in sorted(profiles, key=lambda p: p.duration, reverse=True)]
+
+    def get(self, profile_id: int) -> Optional[Profile]:
+        with self._lock:
+            for _, _, profile in self._heap:
+                if profile.id == profile_id:
+                    return profile
+        return None
+
+
+recorder = ProfileRecorder()
+
+_current: contextvars.ContextVar[Optional[_Session]] = contextvars.ContextVar("profile_session", default=None)
+
+
+def _run_tracked(fn, args, kwargs):
+    # Gancho de storage.run_io: el hilo del pool se muestrea mientras trabaja para la petición
+    session = _current.get()
+    if session is None:
+        return fn(*args, **kwargs)
+    thread_id = threading.get_ident()
+    session.attach(thread_id, threading.current_thread().name)
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        session.detach(thread_id)
+
+
+def _public_query(query_string: bytes) -> str:
+    # La contraseña no se guarda con el perfil
+    return urlencode([(k, v) for k, v in parse_qsl(query_string.decode("latin-1")) if k != "pwd"])
+
+
+class ProfilerMiddleware:
+    # Sólo se añade a la app si PROFILER está activo
+    def __init__(self, app, admin_pwd: str, mode: str = PROFILER_MODE, routes: Tuple[str, ...] = PROFILE_ROUTES):
+        self.app = app
+        self.admin_pwd = admin_pwd.encode("latin-1")
+        self.mode = mode
+        self.routes = routes
+        storage.call_hook = _run_tracked
+
+    def _wanted(self, scope) -> bool:
+        if self.mode == "all":
+            return scope["path"] in self.routes
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                return value == self.admin_pwd
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        session = recorder.start(threading.get_ident())
+        token = _current.set(session)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            _current.reset(token)
+            recorder.stop(session, scope["method"], scope["path"], _public_query(scope["query_string"]),
+                          status[0], duration)
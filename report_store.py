@@ -0,0 +1,492 @@
+import os
+import json
+import shutil
+import sqlite3
+import threading
+import base64
+import binascii
+import argparse
+from typing import List, Optional, Dict, Tuple
+
+import analytics
+import changelog
+import search_index
+from archive import Archive, ARCHIVE_DIR_NAME, month_of
+import metrics
+import serializer
+from name_index import normalize_name
+from dedup import submission_key
+
+# --- ALMACÉN DE REPORTES (SQLite embebido) ---
+# Cada envío es una fila; el "filename" histórico (prefijo de fecha + nombre + reto)
+# se conserva como ID para que el panel admin pueda seguir borrando por nombre.
+# Los meses cerrados se mueven a segmentos comprimidos en reportes/archivo/ (archive.py);
+# las lecturas combinan ambos y descartan los meses fuera del rango pedido.
+
+REPORTS_DIR = "reportes"
+DB_REPORTS = os.path.join(REPORTS_DIR, "reportes.db")
+IMPORTED_DIR = os.path.join(REPORTS_DIR, "importados")
+SQLITE_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    filename TEXT PRIMARY KEY,
+    challenge_id TEXT NOT NULL,
+    student_name TEXT NOT NULL,
+    name_key TEXT NOT NULL DEFAULT '',
+    idem_key TEXT NOT NULL DEFAULT '',
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_challenge ON reports (challenge_id);
+CREATE INDEX IF NOT EXISTS idx_reports_idem ON reports (idem_key);
+"""
+
+
+def encode_cursor(filename: str) -> str:
+    return base64.urlsafe_b64encode(filename.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> str:
+    # ValueError si el cursor no es válido (lo convierte en 400 el endpoint).
+    # validate=True: urlsafe_b64decode ignora los caracteres ajenos ("!!!" daría "")
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        filename = base64.b64decode(padded.encode("ascii"), altchars=b"-_", validate=True).decode("utf-8")
+    except (UnicodeError, binascii.Error) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+    if not filename or encode_cursor(filename) != cursor:
+        raise ValueError("Cursor inválido")
+    return filename
+
+
+class ReportStore:
+    def __init__(self, path: str = DB_REPORTS, generations=None):
+        self.path = path
+        # Contador compartido entre workers (shared_state.Generations): se incrementa tras
+        # cada commit para que los demás procesos sigan el registro de cambios
+        self.generations = generations
+        # Una conexión de escritura protegida por candado y una de lectura por hilo:
+        # con WAL las lecturas del pool de almacenamiento no esperan a las escrituras.
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        # timeout: con varios workers, espera al escritor de otro proceso en vez de fallar
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: cada commit hace fsync del WAL; un lote confirmado ya es durable
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._upgrade_schema()
+        self._conn.executescript(SCHEMA)
+        self._conn.executescript(analytics.SCHEMA)
+        self._init_analytics()
+        self._changes_since_compact = 0
+        self._init_changelog()
+        self.archive = Archive(os.path.join(os.path.dirname(path), ARCHIVE_DIR_NAME))
+        # Búsqueda de texto (FTS5): si esta compilación de SQLite no la trae, /api/search responde 503
+        self.search_enabled = search_index.available(self._conn)
+        if self.search_enabled:
+            self._init_search()
+
+    def _init_analytics(self) -> None:
+        # Bases anteriores a la analítica: los agregados se calculan una vez al abrirlas
+        has_stats = self._conn.execute("SELECT 1 FROM challenge_stats LIMIT 1").fetchone()
+        has_reports = self._conn.execute("SELECT 1 FROM reports LIMIT 1").fetchone()
+        if has_reports and not has_stats:
+            analytics.rebuild(self._conn)
+
+    def _init_changelog(self) -> None:
+        # Bases anteriores al registro de cambios: cada reporte existente cuenta como alta
+        has_log = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'report_changes'").fetchone()
+        self._conn.executescript(changelog.SCHEMA)
+        if not has_log:
+            changelog.seed(self._conn)
+
+    def _init_search(self) -> None:
+        # Bases anteriores a la búsqueda: el índice se construye una vez al abrirlas
+        has_index = self._conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'step_search'").fetchone()
+        self._conn.executescript(search_index.SCHEMA)
+        if not has_index:
+            self.rebuild_search()
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, check_same_thread=False, timeout=SQLITE_TIMEOUT)
+        return conn
+
+    def _upgrade_schema(self) -> None:
+        # Bases creadas antes de las columnas name_key / idem_key: se añaden y se rellenan una vez
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(reports)")]
+        if not columns:
+            return
+        if "name_key" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE reports ADD COLUMN name_key TEXT NOT NULL DEFAULT ''")
+                rows = self._conn.execute("SELECT filename, student_name FROM reports").fetchall()
+                self._conn.executemany(
+                    "UPDATE reports SET name_key = ? WHERE filename = ?",
+                    [(normalize_name(name), filename) for filename, name in rows],
+                )
+        if "idem_key" not in columns:
+            with self._conn:
+                self._conn.execute("ALTER TABLE reports ADD COLUMN idem_key TEXT NOT NULL DEFAULT ''")
+                rows = self._conn.execute("SELECT filename, data FROM reports").fetchall()
+                self._conn.executemany(
+                    "UPDATE reports SET idem_key = ? WHERE filename = ?",
+                    [(submission_key(serializer.loads(data)), filename) for filename, data in rows],
+                )
+
+    def _row_to_report(self, filename: str, data: str) -> Dict:
+        report = serializer.loads(data)
+        report["filename"] = filename
+        return report
+
+    def _decode(self, rows) -> List[Dict]:
+        metrics.record_read(rows=len(rows), nbytes=sum(len(data) for _, data in rows))
+        return [self._row_to_report(filename, data) for filename, data in rows]
+
+    def add(self, filename: str, report: Dict) -> None:
+        with self._lock, self._conn:
+            self._insert(filename, report)
+        self._committed()
+
+    def add_many(self, reports: List[Tuple[str, Dict]]) -> None:
+        # Un solo commit (y un solo fsync) para todo el lote
+        with self._lock, self._conn:
+            for filename, report in reports:
+                self._insert(filename, report)
+        self._committed()
+
+    def update_many(self, reports: List[Tuple[str, Dict]]) -> int:
+        # Reescribe el JSON de reportes existentes (p. ej. al recalificar). Devuelve cuántos
+        # se reescribieron: los de meses archivados (o ya borrados) no se tocan
+        updated = 0
+        with self._lock, self._conn:
+            for filename, report in reports:
+                old = self._load_for_write(filename)
+                if old is None:
+                    continue
+                updated += 1
+                analytics.apply_report(self._conn, filename, old, -1)
+                self._conn.execute(
+                    "UPDATE reports SET data = ? WHERE filename = ?",
+                    (serializer.dumps_str(report), filename),
+                )
+                analytics.apply_report(self._conn, filename, report, +1)
+                if self.search_enabled and old.get("steps") != report.get("steps"):
+                    search_index.unindex_report(self._conn, filename)
+                    search_index.index_report(self._conn, filename, report)
+                changelog.append(self._conn, filename, changelog.UPDATE)
+                self._changes_since_compact += 1
+        self._committed()
+        self._maybe_compact()
+        return updated
+
+    def _load_for_write(self, filename: str) -> Optional[Dict]:
+        row = self._conn.execute("SELECT data FROM reports WHERE filename = ?", (filename,)).fetchone()
+        return serializer.loads(row[0]) if row else None
+
+    def _insert(self, filename: str, report: Dict, replace: bool = True) -> bool:
+        # Los agregados de analítica se actualizan en la misma transacción que el reporte
+        old = self._load_for_write(filename)
+        if old is not None:
+            if not replace:
+                return False
+            analytics.apply_report(self._conn, filename, old, -1)
+            if self.search_enabled:
+                search_index.unindex_report(self._conn, filename)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO reports (filename, challenge_id, student_name, name_key, idem_key, timestamp, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                filename,
+                report.get("challenge_id", ""),
+                report.get("student_name", ""),
+                normalize_name(report.get("student_name", "")),
+                submission_key(report),
+                report.get("timestamp"),
+                serializer.dumps_str(report),
+            ),
+        )
+        analytics.apply_report(self._conn, filename, report, +1)
+        if self.search_enabled:
+            search_index.index_report(self._conn, filename, report)
+        changelog.append(self._conn, filename, changelog.UPSERT if old is None else changelog.UPDATE)
+        if old is not None:
+            self._changes_since_compact += 1
+        return True
+
+    def get(self, filename: str) -> Optional[Dict]:
+        row = self._reader().execute(
+            "SELECT filename, data FROM reports WHERE filename = ?", (filename,)
+        ).fetchone()
+        if row is None:
+            data = self.archive.get(filename)
+            row = (filename, data) if data is not None else None
+        return self._decode([row])[0] if row else None
+
+    def all(self) -> List[Dict]:
+        # Más recientes primero, igual que el antiguo sorted(os.listdir(...), reverse=True)
+        rows = dict(self.archive.iter_all())
+        rows.update(self._reader().execute("SELECT filename, data FROM reports").fetchall())
+        return self._decode(sorted(rows.items(), reverse=True))
+
+    def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        challenge_id: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        student: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        # Paginación por keyset sobre el filename (prefijo AAAAMMDD_HHMMSS): estable aunque
+        # lleguen reportes nuevos o se borren otros entre página y página.
+        below = decode_cursor(cursor) if cursor else None
+        date_from = date_from.replace("-", "") if date_from else None
+        date_to = date_to.replace("-", "") if date_to else None
+        name_key = normalize_name(student) if student else None
+        where, params = [], []
+        if below:
+            where.append("filename < ?")
+            params.append(below)
+        if challenge_id:
+            where.append("challenge_id = ?")
+            params.append(challenge_id)
+        if date_from:
+            where.append("filename >= ?")
+            params.append(date_from)
+        if date_to:
+            # Fecha inclusiva: todo lo que empiece por AAAAMMDD es menor que AAAAMMDD + "~"
+            where.append("filename < ?")
+            params.append(date_to + "~")
+        if name_key:
+            where.append("instr(name_key, ?) > 0")
+            params.append(name_key)
+
+        sql = "SELECT filename, data FROM reports"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY filename DESC LIMIT ?"
+        params.append(limit + 1)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        # Meses archivados: sólo los que pueden aportar algo por encima de la última fila
+        # de SQLite; con una página llena de datos recientes no se abre ningún segmento
+        archived = self.archive.scan(
+            limit + 1,
+            below=below,
+            above=rows[limit][0] if len(rows) > limit else None,
+            date_from=date_from,
+            date_to=date_to,
+            challenge_id=challenge_id,
+            name_key=name_key,
+        )
+        if archived:
+            merged = dict(archived)
+            merged.update(rows)
+            rows = sorted(merged.items(), reverse=True)[:limit + 1]
+        items = self._decode(rows[:limit])
+        next_cursor = encode_cursor(rows[limit - 1][0]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def name_keys(self) -> List[Tuple[str, str]]:
+        # (filename, name_key) de todos los reportes, para reconstruir el índice de nombres
+        return self.archive.name_keys() + self._reader().execute("SELECT filename, name_key FROM reports").fetchall()
+
+    def find_by_key(self, idem_key: str, since_id: str = "") -> Optional[Dict]:
+        # Envío más antiguo con esa clave de idempotencia y ID >= since_id
+        row = self._reader().execute(
+            "SELECT filename, data FROM reports WHERE idem_key = ? AND filename >= ? ORDER BY filename LIMIT 1",
+            (idem_key, since_id),
+        ).fetchone()
+        return self._decode([row])[0] if row else None
+
+    def idem_keys(self, since_id: str = "") -> List[str]:
+        return [key for (key,) in self._reader().execute(
+            "SELECT idem_key FROM reports WHERE filename >= ?", (since_id,)
+        )]
+
+    def duplicate_groups(self) -> List[List[str]]:
+        # IDs de reportes con la misma clave de idempotencia, del más antiguo al más nuevo
+        rows = self._reader().execute(
+            """SELECT idem_key, filename FROM reports WHERE idem_key IN (
+                   SELECT idem_key FROM reports GROUP BY idem_key HAVING COUNT(*) > 1
+               ) ORDER BY idem_key, filename"""
+        ).fetchall()
+        groups: Dict[str, List[str]] = {}
+        for key, filename in rows:
+            groups.setdefault(key, []).append(filename)
+        return list(groups.values())
+
+    def get_many(self, filenames: List[str]) -> List[Dict]:
+        # Conserva el orden recibido
+        if not filenames:
+            return []
+        found = {}
+        conn = self._reader()
+        for i in range(0, len(filenames), 500):
+            chunk = filenames[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            for filename, data in conn.execute(
+                f"SELECT filename, data FROM reports WHERE filename IN ({marks})", chunk
+            ):
+                found[filename] = data
+        for filename in filenames:
+            if filename not in found:
+                data = self.archive.get(filename)
+                if data is not None:
+                    found[filename] = data
+        return self._decode([(f, found[f]) for f in filenames if f in found])
+
+    def delete(self, filename: str) -> bool:
+        with self._lock, self._conn:
+            old = self._load_for_write(filename)
+            archived = self.archive.get(filename)
+            if old is None and archived is None:
+                return False
+            if old is not None:
+                self._conn.execute("DELETE FROM reports WHERE filename = ?", (filename,))
+            else:
+                old = serializer.loads(archived)
+            if archived is not None:
+                # Si falla la anotación de la baja, la transacción se deshace
+                self.archive.delete(filename)
+            analytics.apply_report(self._conn, filename, old, -1)
+            if self.search_enabled:
+                search_index.unindex_report(self._conn, filename)
+            changelog.append(self._conn, filename, changelog.DELETE)
+            self._changes_since_compact += 1
+        self._committed()
+        self._maybe_compact()
+        return True
+
+    def get_analytics(self, challenge_id: Optional[str] = None) -> List[Dict]:
+        return analytics.query(self._reader(), challenge_id)
+
+    def rebuild_analytics(self) -> None:
+        with self._lock:
+            analytics.rebuild(self._conn)
+            with self._conn:
+                for filename, data in self.archive.iter_all():
+                    analytics.apply_report(self._conn, filename, serializer.loads(data), +1)
+
+    def search(self, text: str, challenge_id: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Tuple[List[Dict], Optional[int]]:
+        return search_index.search(self._reader(), text, challenge_id, limit, offset)
+
+    def rebuild_search(self) -> None:
+        # Incluye los meses archivados: sus pasos siguen siendo buscables
+        with self._lock:
+            search_index.rebuild(
+                self._conn,
+                ((filename, serializer.loads(data)) for filename, data in self.archive.iter_all()),
+            )
+
+    def changes(self, since: Optional[str], limit: int) -> Dict:
+        return changelog.changes(self._reader(), since, limit, self.archive.get)
+
+    def compact_changes(self, retention_days: float = changelog.CHANGELOG_RETENTION_DAYS) -> Tuple[int, int]:
+        with self._lock:
+            self._changes_since_compact = 0
+            return changelog.compact(self._conn, retention_days)
+
+    def changes_cursor(self) -> str:
+        # Cursor de /api/reports/changes que apunta al último cambio actual
+        return changelog.current_cursor(self._reader())
+
+    def _committed(self) -> None:
+        if self.generations is not None:
+            self.generations.bump("reports")
+
+    def _maybe_compact(self) -> None:
+        if self._changes_since_compact >= changelog.CHANGELOG_COMPACT_EVERY:
+            self.compact_changes()
+
+    def latest_id(self) -> Optional[str]:
+        row = self._reader().execute("SELECT MAX(filename) FROM reports").fetchone()
+        return row[0] if row and row[0] else self.archive.latest_id()
+
+    def count(self) -> int:
+        return self._reader().execute("SELECT COUNT(*) FROM reports").fetchone()[0] + self.archive.count()
+
+    def archive_months(self, before: str) -> List[Tuple[str, int]]:
+        # Mueve a segmentos los meses anteriores a `before` (AAAAMM). El segmento se escribe
+        # (con fsync) antes de borrar las filas: si algo falla en medio, el reporte queda
+        # repetido, nunca perdido, y las lecturas prefieren la copia de SQLite.
+        # No toca analítica ni registro de cambios: los reportes siguen existiendo.
+        months = [
+            m for (m,) in self._reader().execute(
+                "SELECT DISTINCT substr(filename, 1, 6) FROM reports WHERE filename < ? ORDER BY 1", (before,)
+            )
+            if month_of(m)
+        ]
+        archived = []
+        for month in months:
+            with self._lock, self._conn:
+                # IMMEDIATE: ningún otro worker escribe ese mes mientras se archiva
+                self._conn.execute("BEGIN IMMEDIATE")
+                rows = self._conn.execute(
+                    "SELECT filename, challenge_id, name_key, data FROM reports WHERE filename >= ? AND filename < ?",
+                    (month, month + "~"),
+                ).fetchall()
+                self.archive.store_month(month, rows)
+                self._conn.execute(
+                    "DELETE FROM reports WHERE filename >= ? AND filename < ?", (month, month + "~")
+                )
+            archived.append((month, len(rows)))
+        return archived
+
+    def compact_archive(self) -> List[Tuple[str, int]]:
+        # Reescribe los segmentos que tienen bajas anotadas
+        return [
+            (month, self.archive.compact(month))
+            for month in self.archive.months()
+            if self.archive.has_deleted(month)
+        ]
+
+    def import_directory(self, directory: str = REPORTS_DIR, imported_dir: str = IMPORTED_DIR) -> int:
+        # Migración única: importa reportes/*.json y los mueve a reportes/importados/
+        # para que un segundo arranque no los vuelva a cargar.
+        files = sorted(f for f in os.listdir(directory) if f.endswith(".json"))
+        if not files:
+            return 0
+
+        os.makedirs(imported_dir, exist_ok=True)
+        imported = 0
+        moved = []
+        with self._lock, self._conn:
+            for filename in files:
+                src = os.path.join(directory, filename)
+                try:
+                    with open(src, "r", encoding="utf-8") as f:
+                        report = json.load(f)
+                except Exception as e:
+                    print(f"Error leyendo {filename}: {e}")
+                    continue
+                if not isinstance(report, dict):
+                    print(f"Error leyendo {filename}: no es un objeto JSON")
+                    continue
+                if self._insert(filename, report, replace=False):
+                    imported += 1
+                moved.append(filename)
+        self._committed()
+        # Los archivos corruptos se quedan en su sitio para revisarlos a mano
+        for filename in moved:
+            shutil.move(os.path.join(directory, filename), os.path.join(imported_dir, filename))
+        return imported
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa los reportes JSON sueltos al almacén SQLite.")
+    parser.add_argument("--dir", default=REPORTS_DIR, help="Carpeta con los reportes *.json")
+    parser.add_argument("--db", default=DB_REPORTS, help="Ruta de la base de datos de reportes")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or ".", exist_ok=True)
+    store = ReportStore(args.db)
+    n = store.import_directory(args.dir, os.path.join(args.dir, "importados"))
+    print(f"Importados {n} reportes. Total en el almacén: {store.count()}")
@@ -0,0 +1,314 @@
+import os
+import sys
+import bisect
+import threading
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from name_index import normalize_name
+from report_store import encode_cursor, decode_cursor
+
+# --- TABLA COMPACTA DE REPORTES EN MEMORIA ---
+# Todo el corpus de reportes residente para el listado admin y el historial, sin guardar
+# cada reporte como dicts anidados (cientos de bytes por paso en claves repetidas y
+# cabeceras de objetos). Es una tabla por columnas:
+#   - reto, nombre, nombre normalizado y question_id se guardan una vez (internados) y cada
+#     fila guarda su número en un array de enteros
+#   - answer y reasoning de todos los pasos van seguidos en un único bytearray UTF-8, con
+#     un array de offsets (el texto k ocupa _text[off[k]:off[k+1]])
+#   - el timestamp es un entero (segundos desde 1970, sin zona horaria)
+#   - la calificación son dos enteros (score/total) y un byte por paso calificado
+# Los dicts se construyen sólo para los reportes de la página pedida. Un reporte con
+# campos inesperados (p. ej. JSON antiguos importados) se guarda tal cual como dict.
+#
+# SQLite sigue siendo la fuente de verdad: la tabla se carga al arrancar y se mantiene con
+# el registro de cambios (ChangeFollower). REPORT_TABLE=0 la desactiva y las consultas
+# vuelven a leer de SQLite.
+
+REPORT_TABLE_ENABLED = os.environ.get("REPORT_TABLE", "1") != "0"
+LOAD_PAGE_SIZE = 2000
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+EPOCH = datetime(1970, 1, 1)
+NO_TIME = -(1 << 63)
+NO_GRADE = -1
+STEP_KEYS = ("question_id", "answer", "reasoning")
+REPORT_KEYS = {"challenge_id", "student_name", "steps", "timestamp", "grade"}
+GRADE_KEYS = {"score", "total", "steps"}
+
+
+def _encode_time(timestamp: Optional[str]) -> Optional[int]:
+    # None si no se puede guardar como entero sin perder el texto original
+    if timestamp is None:
+        return NO_TIME
+    try:
+        moment = datetime.strptime(timestamp, TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+    if moment.strftime(TIMESTAMP_FORMAT) != timestamp:
+        return None
+    return int((moment - EPOCH).total_seconds())
+
+
+def _decode_time(value: int) -> Optional[str]:
+    if value == NO_TIME:
+        return None
+    return (EPOCH + timedelta(seconds=value)).strftime(TIMESTAMP_FORMAT)
+
+
+def _compact_form(report: Dict) -> bool:
+    keys = set(report) - {"filename"}
+    if keys - REPORT_KEYS or not keys >= REPORT_KEYS - {"grade"}:
+        return False
+    if not isinstance(report["challenge_id"], str) or not isinstance(report["student_name"], str):
+        return False
+    steps = report["steps"]
+    if not isinstance(steps, list):
+        return False
+    for step in steps:
+        if not isinstance(step, dict) or tuple(step) != STEP_KEYS or not all(isinstance(v, str) for v in step.values()):
+            return False
+    grade = report.get("grade")
+    if "grade" in report:
+        if not isinstance(grade, dict) or set(grade) != GRADE_KEYS or not isinstance(grade["steps"], dict):
+            return False
+        if not all(type(grade[k]) is int and 0 <= grade[k] < 1 << 15 for k in ("score", "total")):
+            return False
+        if not all(isinstance(q, str) and type(ok) is bool for q, ok in grade["steps"].items()):
+            return False
+    return _encode_time(report["timestamp"]) is not None
+
+
+class ReportTable:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self._name_keys: set = set()
+        self._string_bytes = 0
+        # Por fila (las filas borradas o reemplazadas quedan con ID None hasta compactar)
+        self._ids: List[Optional[str]] = []
+        self._row_by_id: Dict[str, int] = {}
+        self._sorted: List[str] = []
+        self._id_bytes = 0
+        self._challenge = array("I")
+        self._student = array("I")
+        self._name_key = array("I")
+        self._time = array("q")
+        self._score = array("h")
+        self._total = array("h")
+        # Pasos de la fila r: [_step_start[r], _step_start[r + 1])
+        self._step_start = array("I", [0])
+        self._qid = array("I")
+        # Dos textos por paso (answer, reasoning): el texto k es _text[_text_off[k]:_text_off[k + 1]]
+        self._text = bytearray()
+        self._text_off = array("Q", [0])
+        # Pasos calificados de la fila r: [_grade_start[r], _grade_start[r + 1])
+        self._grade_start = array("I", [0])
+        self._grade_qid = array("I")
+        self._grade_ok = bytearray()
+        self._extras: Dict[int, Dict] = {}
+        self._dead = 0
+
+    # --- Carga y cambios ---
+
+    def load(self, store) -> int:
+        # Recorre el almacén (SQLite y meses archivados) por páginas
+        with self._lock:
+            self._reset()
+        cursor = None
+        while True:
+            reports, cursor = store.page(LOAD_PAGE_SIZE, cursor)
+            with self._lock:
+                for report in reports:
+                    self._put(report["filename"], report)
+            if not cursor:
+                break
+        self._publish_stats()
+        return len(self._sorted)
+
+    def put(self, filename: str, report: Dict) -> None:
+        with self._lock:
+            self._put(filename, report)
+            self._maybe_compact()
+        self._publish_stats()
+
+    def remove(self, filename: str) -> None:
+        with self._lock:
+            row = self._row_by_id.pop(filename, None)
+            if row is None:
+                return
+            self._kill(row)
+            i = bisect.bisect_left(self._sorted, filename)
+            del self._sorted[i]
+            self._maybe_compact()
+        self._publish_stats()
+
+    def _intern(self, value: str) -> int:
+        i = self._string_ids.get(value)
+        if i is None:
+            i = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+            self._string_bytes += sys.getsizeof(value)
+        return i
+
+    def _kill(self, row: int) -> None:
+        self._id_bytes -= sys.getsizeof(self._ids[row])
+        self._ids[row] = None
+        self._extras.pop(row, None)
+        self._dead += 1
+
+    def _put(self, filename: str, report: Dict) -> None:
+        old = self._row_by_id.get(filename)
+        if old is not None:
+            self._kill(old)
+        else:
+            bisect.insort(self._sorted, filename)
+        row = len(self._ids)
+        self._ids.append(filename)
+        self._id_bytes += sys.getsizeof(filename)
+        self._row_by_id[filename] = row
+
+        student_name = str(report.get("student_name", ""))
+        name_key = self._intern(normalize_name(student_name))
+        self._name_keys.add(name_key)
+        self._challenge.append(self._intern(str(report.get("challenge_id", ""))))
+        self._student.append(self._intern(student_name))
+        self._name_key.append(name_key)
+
+        if _compact_form(report):
+            self._time.append(_encode_time(report["timestamp"]))
+            for step in report["steps"]:
+                self._qid.append(self._intern(step["question_id"]))
+                for text in (step["answer"], step["reasoning"]):
+                    self._text += text.encode("utf-8")
+                    self._text_off.append(len(self._text))
+            grade = report.get("grade")
+            if grade is None:
+                self._score.append(NO_GRADE)
+                self._total.append(NO_GRADE)
+            else:
+                self._score.append(grade["score"])
+                self._total.append(grade["total"])
+                for qid, ok in grade["steps"].items():
+                    self._grade_qid.append(self._intern(qid))
+                    self._grade_ok.append(ok)
+        else:
+            self._time.append(NO_TIME)
+            self._score.append(NO_GRADE)
+            self._total.append(NO_GRADE)
+            self._extras[row] = {k: v for k, v in report.items() if k != "filename"}
+        self._step_start.append(len(self._qid))
+        self._grade_start.append(len(self._grade_qid))
+
+    def _maybe_compact(self) -> None:
+        # Reemplazos y bajas dejan filas muertas: se reconstruye cuando superan a las vivas
+        if self._dead <= max(1000, len(self._sorted)):
+            return
+        reports = [self._report(self._row_by_id[f]) for f in self._sorted]
+        self._reset()
+        for report in reports:
+            self._put(report["filename"], report)
+
+    # --- Consultas (mismas firmas que ReportStore) ---
+
+    def _report(self, row: int) -> Dict:
+        extra = self._extras.get(row)
+        if extra is not None:
+            report = dict(extra)
+        else:
+            strings, text, off = self._strings, self._text, self._text_off
+            steps = []
+            for i in range(self._step_start[row], self._step_start[row + 1]):
+                a, b, c = off[2 * i], off[2 * i + 1], off[2 * i + 2]
+                steps.append({
+                    "question_id": strings[self._qid[i]],
+                    "answer": text[a:b].decode("utf-8"),
+                    "reasoning": text[b:c].decode("utf-8"),
+                })
+            report = {
+                "challenge_id": strings[self._challenge[row]],
+                "student_name": strings[self._student[row]],
+                "steps": steps,
+                "timestamp": _decode_time(self._time[row]),
+            }
+            if self._score[row] != NO_GRADE:
+                report["grade"] = {
+                    "score": self._score[row],
+                    "total": self._total[row],
+                    "steps": {
+                        strings[self._grade_qid[i]]: bool(self._grade_ok[i])
+                        for i in range(self._grade_start[row], self._grade_start[row + 1])
+                    },
+                }
+        report["filename"] = self._ids[row]
+        return report
+
+    def page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None,
+        challenge_id: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        student: Optional[str] = None,
+    ) -> Tuple[List[Dict], Optional[str]]:
+        below = decode_cursor(cursor) if cursor else None
+        with self._lock:
+            ids = self._sorted
+            # Los filtros de fecha y el cursor son rangos del ID (prefijo AAAAMMDD_HHMMSS)
+            hi = bisect.bisect_left(ids, below) if below else len(ids)
+            if date_to:
+                hi = min(hi, bisect.bisect_left(ids, date_to.replace("-", "") + "~"))
+            lo = bisect.bisect_left(ids, date_from.replace("-", "")) if date_from else 0
+            challenge = None
+            if challenge_id:
+                challenge = self._string_ids.get(challenge_id, -1)
+            names = None
+            if student:
+                key = normalize_name(student)
+                names = {i for i in self._name_keys if key in self._strings[i]}
+
+            rows = []
+            for i in range(hi - 1, lo - 1, -1):
+                row = self._row_by_id[ids[i]]
+                if challenge is not None and self._challenge[row] != challenge:
+                    continue
+                if names is not None and self._name_key[row] not in names:
+                    continue
+                rows.append(row)
+                if len(rows) > limit:
+                    break
+            items = [self._report(row) for row in rows[:limit]]
+        next_cursor = encode_cursor(items[-1]["filename"]) if len(rows) > limit else None
+        return items, next_cursor
+
+    def get_many(self, filenames: List[str]) -> List[Dict]:
+        # Conserva el orden recibido; los que no están se omiten
+        with self._lock:
+            rows = [self._row_by_id.get(f) for f in filenames]
+            return [self._report(row) for row in rows if row is not None]
+
+    def __len__(self) -> int:
+        return len(self._sorted)
+
+    # --- Memoria ---
+
+    def memory_bytes(self) -> int:
+        # Estimación de lo que ocupa la tabla (arrays, textos, strings internados e índices)
+        arrays = (self._challenge, self._student, self._name_key, self._time, self._score, self._total,
+                  self._step_start, self._qid, self._text_off, self._grade_start, self._grade_qid)
+        size = sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+        size += len(self._text) + len(self._grade_ok)
+        size += self._string_bytes + self._id_bytes
+        size += sum(sys.getsizeof(c) for c in (self._strings, self._string_ids, self._ids, self._row_by_id, self._sorted))
+        return size + sum(sys.getsizeof(r) for r in self._extras.values())
+
+    def _publish_stats(self) -> None:
+        metrics.report_table_rows.set(len(self._sorted))
+        metrics.report_table_bytes.set(self.memory_bytes())
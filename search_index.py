@@ -0,0 +1,190 @@
+import re
+import sqlite3
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+# --- BÚSQUEDA DE TEXTO EN RESPUESTAS Y RAZONAMIENTOS ---
+# Índice invertido SQLite FTS5 con una fila por paso (StepEvidence). El tokenizador
+# unicode61 con remove_diacritics ignora tildes y mayúsculas: "energia" encuentra "Energía".
+# Se actualiza en la misma transacción que cada alta o baja, como la analítica. Las filas
+# de un reporte tienen rowids consecutivos (step_search_docs guarda el primero y cuántos
+# son) para borrarlas sin recorrer el índice.
+#
+# Consultas: palabras separadas por espacios, todas obligatorias; "palabra*" busca por
+# prefijo y "frase entre comillas" busca la frase exacta. Orden por relevancia (bm25).
+
+SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS step_search USING fts5 (
+    filename UNINDEXED,
+    challenge_id UNINDEXED,
+    student_name UNINDEXED,
+    question_id UNINDEXED,
+    answer,
+    reasoning,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+CREATE TABLE IF NOT EXISTS step_search_docs (
+    filename TEXT PRIMARY KEY,
+    first_rowid INTEGER NOT NULL,
+    steps INTEGER NOT NULL
+);
+"""
+
+MAX_SEARCH_PAGE = 100
+# Peso de cada columna en bm25 (las UNINDEXED no cuentan)
+ANSWER_WEIGHT = 1.0
+REASONING_WEIGHT = 1.0
+SNIPPET_TOKENS = 12
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+")
+
+
+def available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS temp.fts5_probe USING fts5 (x)")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+
+def _steps(report: Dict) -> List[Dict]:
+    steps = report.get("steps")
+    if not isinstance(steps, list):
+        return []
+    return [s for s in steps if isinstance(s, dict)]
+
+
+def index_report(conn: sqlite3.Connection, filename: str, report: Dict) -> None:
+    steps = _steps(report)
+    if not steps:
+        return
+    # ORDER BY rowid DESC LIMIT 1 lo resuelve FTS5 sin recorrer el índice (MAX(rowid) no)
+    last = conn.execute("SELECT rowid FROM step_search ORDER BY rowid DESC LIMIT 1").fetchone()
+    first = (last[0] if last else 0) + 1
+    conn.executemany(
+        """INSERT INTO step_search (rowid, filename, challenge_id, student_name, question_id, answer, reasoning)
+           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+        [
+            (first + i, filename, report.get("challenge_id", ""), report.get("student_name", ""),
+             str(step.get("question_id", "")), str(step.get("answer", "")), str(step.get("reasoning", "")))
+            for i, step in enumerate(steps)
+        ],
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO step_search_docs (filename, first_rowid, steps) VALUES (?, ?, ?)",
+        (filename, first, len(steps)),
+    )
+
+
+def unindex_report(conn: sqlite3.Connection, filename: str) -> None:
+    row = conn.execute("SELECT first_rowid, steps FROM step_search_docs WHERE filename = ?", (filename,)).fetchone()
+    if row is None:
+        return
+    first, steps = row
+    conn.execute("DELETE FROM step_search WHERE rowid BETWEEN ? AND ?", (first, first + steps - 1))
+    conn.execute("DELETE FROM step_search_docs WHERE filename = ?", (filename,))
+
+
+def rebuild(conn: sqlite3.Connection, extra_reports=()) -> None:
+    # Recalculo completo: pasos de la tabla reports en SQL, más extra_reports (meses
+    # archivados) como pares (filename, report)
+    with conn:
+        conn.execute("DELETE FROM step_search")
+        conn.execute("DELETE FROM step_search_docs")
+        conn.execute(
+            """INSERT INTO step_search (filename, challenge_id, student_name, question_id, answer, reasoning)
+               SELECT r.filename, r.challenge_id, r.student_name,
+                      COALESCE(json_extract(s.value, '$.question_id'), ''),
+                      COALESCE(json_extract(s.value, '$.answer'), ''),
+                      COALESCE(json_extract(s.value, '$.reasoning'), '')
+               FROM reports r, json_each(r.data, '$.steps') s
+               WHERE json_type(r.data, '$.steps') = 'array' AND s.type = 'object'
+               ORDER BY r.filename, s.key"""
+        )
+        conn.execute(
+            """INSERT INTO step_search_docs (filename, first_rowid, steps)
+               SELECT filename, MIN(rowid), COUNT(*) FROM step_search GROUP BY filename"""
+        )
+        for filename, report in extra_reports:
+            index_report(conn, filename, report)
+
+
+def build_query(text: str) -> Optional[str]:
+    # Texto del buscador -> expresión FTS5 segura (sin operadores ni columnas sueltas)
+    terms = []
+    for phrase, word in _TERM.findall(text):
+        if phrase:
+            words = _WORD.findall(phrase)
+            if words:
+                terms.append('"' + " ".join(words) + '"')
+            continue
+        tokens = _WORD.findall(word)
+        for i, token in enumerate(tokens):
+            prefix = word.endswith("*") and i == len(tokens) - 1
+            terms.append(f'"{token}"' + ("*" if prefix else ""))
+    return " ".join(terms) or None
+
+
+def search(
+    conn: sqlite3.Connection,
+    text: str,
+    challenge_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+) -> Tuple[List[Dict], Optional[int]]:
+    # (pasos encontrados, offset de la página siguiente o None)
+    query = build_query(text)
+    if query is None:
+        return [], None
+    # Primero sólo el orden (bm25) y después los campos y el fragmento de la página pedida:
+    # snippet() en la consulta ordenada se calcularía para todas las coincidencias
+    sql = f"""SELECT rowid, bm25(step_search, 0, 0, 0, 0, {ANSWER_WEIGHT}, {REASONING_WEIGHT}) AS score
+              FROM step_search WHERE step_search MATCH ?"""
+    params: list = [query]
+    if challenge_id:
+        sql += " AND challenge_id = ?"
+        params.append(challenge_id)
+    # bm25 es más negativo cuanto más relevante; a igual relevancia, lo más reciente primero
+    sql += " ORDER BY score, rowid DESC LIMIT ? OFFSET ?"
+    params += [limit + 1, offset]
+    ranked = conn.execute(sql, params).fetchall()
+    scores = dict(ranked[:limit])
+    if not scores:
+        return [], None
+    rows = conn.execute(
+        f"""SELECT rowid, filename, challenge_id, student_name, question_id, answer, reasoning,
+                   snippet(step_search, -1, '«', '»', '…', {SNIPPET_TOKENS})
+            FROM step_search WHERE step_search MATCH ? AND rowid IN ({",".join("?" * len(scores))})""",
+        [query, *scores],
+    ).fetchall()
+    by_rowid = {row[0]: row[1:] for row in rows}
+    hits = []
+    for rowid, score in scores.items():
+        filename, challenge, student, question_id, answer, reasoning, snippet = by_rowid[rowid]
+        hits.append({
+            "filename": filename, "challenge_id": challenge, "student_name": student,
+            "question_id": question_id, "answer": answer, "reasoning": reasoning,
+            "snippet": snippet, "score": round(-score, 4),
+        })
+    return hits, offset + limit if len(ranked) > limit else None
+
+
+if __name__ == "__main__":
+    from report_store import ReportStore, DB_REPORTS
+
+    parser = argparse.ArgumentParser(description="Busca en las respuestas y razonamientos de los reportes.")
+    parser.add_argument("query")
+    parser.add_argument("--db", default=DB_REPORTS)
+    parser.add_argument("--challenge")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruye el índice antes de buscar")
+    args = parser.parse_args()
+
+    store = ReportStore(args.db)
+    if args.rebuild:
+        store.rebuild_search()
+    hits, _ = store.search(args.query, args.challenge, args.limit)
+    for hit in hits:
+        print(f"{hit['score']:7.2f}  {hit['filename']}  {hit['question_id']}: {hit['snippet']}")
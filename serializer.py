@@ -0,0 +1,67 @@
+import os
+import json
+from typing import Any, Callable, Type, TypeVar
+
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+# --- SERIALIZACIÓN JSON RÁPIDA ---
+# Una sola capa para el formato de almacenamiento (columna data de SQLite, registro de
+# cambios, exportación, canal en vivo) y para las respuestas de la API. Con orjson
+# instalado (opcional) se usa orjson; si no, el json de la biblioteca estándar, con la misma
+# salida compacta. JSON_BACKEND=json fuerza la biblioteca estándar (para comparar).
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if os.environ.get("JSON_BACKEND", "orjson") == "json":
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+M = TypeVar("M", bound=BaseModel)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        return orjson.dumps(obj, option=_OPTIONS)
+
+    def dumps_str(obj: Any) -> str:
+        return orjson.dumps(obj, option=_OPTIONS).decode("utf-8")
+
+    loads: Callable[[Any], Any] = orjson.loads
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def dumps_str(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+    loads = json.loads
+
+
+class FastJSONResponse(JSONResponse):
+    # Clase de respuesta por defecto de la app. Los endpoints con respuestas grandes la
+    # devuelven directamente: así FastAPI no pasa cada reporte por jsonable_encoder.
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_body(model: Type[M]) -> Callable[[Request], Any]:
+    # Dependencia que valida el cuerpo directamente desde los bytes (model_validate_json),
+    # sin construir antes el dict intermedio. Mismo 422 que la validación de FastAPI.
+    async def parse(request: Request) -> M:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            errors = e.errors(include_url=False, include_context=False)
+            for error in errors:
+                error["loc"] = ("body", *error["loc"])
+            raise RequestValidationError(errors)
+    return parse
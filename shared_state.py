@@ -0,0 +1,112 @@
+import os
+import mmap
+import struct
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional
+
+from catalog import FileLock
+from storage import run_io
+
+# --- ESTADO COMPARTIDO ENTRE WORKERS (uvicorn --workers N) ---
+# Un archivo pequeño mapeado en memoria con contadores de 64 bits. Quien escribe
+# (catálogo, almacén de reportes) incrementa su contador bajo un candado de archivo; cada
+# worker compara el valor con el último que vio, sin syscalls, para saber si su caché
+# quedó vieja. La ranura "ids" guarda el último instante usado en un ID de reporte para
+# que los IDs sean únicos y crecientes entre todos los workers.
+
+SHARED_STATE_PATH = os.path.join("reportes", "estado_compartido")
+STARTUP_LOCK_PATH = os.path.join("reportes", "arranque.lock")
+FOLLOW_INTERVAL = float(os.environ.get("FOLLOW_INTERVAL_MS", "100")) / 1000
+
+SLOTS = {"catalog": 0, "reports": 1, "ids": 2}
+_SLOT = struct.Struct("<Q")
+
+
+class Generations:
+    def __init__(self, path: str = SHARED_STATE_PATH):
+        self.path = path
+        # Un FileLock nuevo por operación: la instancia guarda el descriptor abierto, así que
+        # compartirla entre hilos los pisa. Dos open() distintos también se excluyen en flock.
+        self._lock_path = path + ".lock"
+        size = _SLOT.size * len(SLOTS)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < size:
+                os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def get(self, slot: str) -> int:
+        return _SLOT.unpack_from(self._map, SLOTS[slot] * _SLOT.size)[0]
+
+    def bump(self, slot: str) -> int:
+        # Bloqueante (flock): se llama desde el pool de almacenamiento, nunca desde el event loop
+        with FileLock(self._lock_path):
+            value = self.get(slot) + 1
+            _SLOT.pack_into(self._map, SLOTS[slot] * _SLOT.size, value)
+        return value
+
+    def advance(self, slot: str, at_least: int) -> int:
+        # max(at_least, actual + 1), atómico entre procesos
+        with FileLock(self._lock_path):
+            value = max(at_least, self.get(slot) + 1)
+            _SLOT.pack_into(self._map, SLOTS[slot] * _SLOT.size, value)
+        return value
+
+    def close(self) -> None:
+        self._map.close()
+
+
+def startup_lock() -> FileLock:
+    # Migraciones de arranque (esquema SQLite, JSON sueltos, compactación): un worker a la vez
+    return FileLock(STARTUP_LOCK_PATH)
+
+
+class ChangeFollower:
+    # Sigue el registro de cambios (changelog) cuando otro worker, o este, guarda o borra
+    # reportes: mantiene al día el índice de nombres y el canal en vivo de cada worker.
+    def __init__(self, store, generations: Generations, on_change: Callable[[Dict], None],
+                 on_reset: Callable[[str], Awaitable[None]], interval: float = FOLLOW_INTERVAL):
+        self.store = store
+        self.generations = generations
+        self.on_change = on_change
+        self.on_reset = on_reset
+        self.interval = interval
+        self.cursor: Optional[str] = None
+        self._seen = -1
+
+    def prime(self) -> None:
+        # Antes de cargar las cachés: lo que llegue después se aplicará encima (es idempotente)
+        self._seen = self.generations.get("reports")
+        self.cursor = self.store.changes_cursor()
+
+    async def catch_up(self) -> int:
+        applied = 0
+        while True:
+            result = await run_io(self.store.changes, self.cursor, 500)
+            if result["reset"]:
+                # Este worker se quedó atrás más que la retención del registro: el cursor se
+                # toma antes de recargar, lo que llegue mientras tanto se aplica encima
+                cursor = await run_io(self.store.changes_cursor)
+                await self.on_reset(cursor)
+                self.cursor = cursor
+                return applied
+            for change in result["changes"]:
+                self.on_change(change)
+                applied += 1
+            self.cursor = result["cursor"]
+            if not result["has_more"]:
+                return applied
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            generation = self.generations.get("reports")
+            if generation == self._seen:
+                continue
+            try:
+                await self.catch_up()
+                self._seen = generation
+            except Exception as e:
+                print(f"Error siguiendo cambios de reportes: {e}")
@@ -0,0 +1,61 @@
+import os
+import shutil
+import time
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import metrics
+
+# --- CAPA DE ALMACENAMIENTO ASÍNCRONA ---
+# Todo acceso a disco (SQLite, challenges.json, retos/, static/) pasa por un pool de
+# hilos acotado para que el event loop sólo atienda parseo y enrutado de peticiones.
+# STORAGE_THREADS controla cuántas operaciones de disco pueden ir en paralelo.
+
+STORAGE_THREADS = int(os.environ.get("STORAGE_THREADS", "8"))
+
+_executor = ThreadPoolExecutor(max_workers=STORAGE_THREADS, thread_name_prefix="storage")
+
+# Lo instala profiler.ProfilerMiddleware sólo si PROFILER está activo; si no, no cuesta nada
+call_hook: Optional[Callable] = None
+
+
+def _timed(fn: Callable, queued_at: float, args, kwargs) -> Any:
+    start = time.perf_counter()
+    try:
+        if call_hook is not None:
+            return call_hook(fn, args, kwargs)
+        return fn(*args, **kwargs)
+    finally:
+        name = getattr(fn, "__qualname__", None) or type(fn).__name__
+        metrics.record_storage_op(name, start - queued_at, time.perf_counter() - start)
+
+
+async def run_io(fn: Callable, *args, **kwargs) -> Any:
+    # Se copia el contexto (como asyncio.to_thread) para que las lecturas del hilo se
+    # sumen a las métricas de la petición que las pidió
+    loop = asyncio.get_running_loop()
+    call = functools.partial(_timed, fn, time.perf_counter(), args, kwargs)
+    return await loop.run_in_executor(_executor, contextvars.copy_context().run, call)
+
+
+def run_parallel(*fns: Callable) -> List[Any]:
+    # Síncrono, para el arranque: reparte las tareas de calentamiento entre los hilos del pool
+    futures = [_executor.submit(contextvars.copy_context().run, fn) for fn in fns]
+    return [f.result() for f in futures]
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=True)
+
+
+# --- Operaciones de archivos usadas por los endpoints ---
+
+async def exists(path: str) -> bool:
+    return await run_io(os.path.exists, path)
+
+
+async def rmtree(path: str) -> None:
+    await run_io(shutil.rmtree, path)
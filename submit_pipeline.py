@@ -0,0 +1,105 @@
+import os
+import asyncio
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from storage import run_io
+
+# --- ENVÍOS AGRUPADOS (GROUP COMMIT) ---
+# Cuando toda la clase pulsa "EJECUTAR SIMULACIÓN" a la vez, los envíos se encolan y se
+# guardan en lotes: una transacción SQLite (un fsync) por lote. Cada petición sólo recibe
+# respuesta cuando su lote ya está en disco.
+#
+# Disparadores: SUBMIT_BATCH_SIZE envíos por lote como máximo y, opcionalmente,
+# SUBMIT_BATCH_DELAY_MS de espera para juntar más. Con 0 (por defecto) el lote es lo que se
+# acumuló mientras se confirmaba el anterior, sin añadir latencia cuando hay poca carga.
+
+SUBMIT_BATCH_SIZE = int(os.environ.get("SUBMIT_BATCH_SIZE", "64"))
+SUBMIT_BATCH_DELAY_MS = float(os.environ.get("SUBMIT_BATCH_DELAY_MS", "0"))
+
+
+class ReportIdGenerator:
+    # IDs "AAAAMMDD_HHMMSS_micro_nombre_reto.json": conservan el prefijo de fecha de los
+    # nombres de archivo de siempre, pero nunca se repiten ni retroceden aunque lleguen
+    # varios envíos en el mismo segundo o el reloj del sistema se atrase. Con varios
+    # workers, el último instante usado vive en el estado compartido (ranura "ids").
+    def __init__(self, latest_id: Optional[str] = None, generations=None):
+        self._lock = threading.Lock()
+        self._last_us = self._parse_us(latest_id) if latest_id else 0
+        self.generations = generations
+
+    @staticmethod
+    def _parse_us(report_id: str) -> int:
+        try:
+            moment = datetime.strptime(report_id[:22], "%Y%m%d_%H%M%S_%f")
+        except ValueError:
+            try:
+                moment = datetime.strptime(report_id[:15], "%Y%m%d_%H%M%S")
+            except ValueError:
+                return 0
+        return int(moment.timestamp() * 1_000_000)
+
+    def next(self, safe_name: str, challenge_id: str) -> Tuple[str, datetime]:
+        with self._lock:
+            now_us = int(datetime.now().timestamp() * 1_000_000)
+            self._last_us = max(now_us, self._last_us + 1)
+            if self.generations is not None:
+                self._last_us = self.generations.advance("ids", self._last_us)
+            moment = datetime.fromtimestamp(self._last_us / 1_000_000)
+        return f"{moment.strftime('%Y%m%d_%H%M%S_%f')}_{safe_name}_{challenge_id}.json", moment
+
+
+class SubmitPipeline:
+    def __init__(self, store, max_batch: int = SUBMIT_BATCH_SIZE, max_delay_ms: float = SUBMIT_BATCH_DELAY_MS):
+        self.store = store
+        self.max_batch = max_batch
+        self.max_delay = max_delay_ms / 1000
+        self._loop = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def _ensure_started(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._task is not None and not self._task.done():
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue()
+        self._task = loop.create_task(self._run())
+
+    async def submit(self, report_id: str, report: Dict) -> None:
+        self._ensure_started()
+        fut = self._loop.create_future()
+        self._queue.put_nowait((report_id, report, fut))
+        await fut
+
+    async def _collect(self) -> List[Tuple[str, Dict, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        # Lo que se acumuló mientras se guardaba el lote anterior entra sin esperar
+        while len(batch) < self.max_batch and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        deadline = self._loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            try:
+                await run_io(self.store.add_many, [(report_id, report) for report_id, report, _ in batch])
+            except Exception as e:
+                print(f"Error guardando lote de {len(batch)} reportes: {e}")
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for _, _, fut in batch:
+                if not fut.done():
+                    fut.set_result(None)